@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from fastapi import APIRouter
+
+from app.admin.api.v1.log.login_log import router as login_log_router
+from app.admin.api.v1.log.opera_log import router as opera_log_router
+
+router = APIRouter(prefix="/logs")
+
+router.include_router(login_log_router, prefix="/login", tags=["login log"])
+router.include_router(opera_log_router, prefix="/opera", tags=["operation log"])
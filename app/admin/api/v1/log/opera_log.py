@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+
+from app.admin.schema.opera_log import GetOperaLogDetail
+from app.admin.service.opera_log_service import opera_log_service
+from common.enums import PageCountType
+from common.pagination import DependsCursorPagination, PageData, cursor_paging_data
+from common.response.response_schema import (
+    ResponseModel,
+    ResponseSchemaModel,
+    response_base,
+)
+from common.security.jwt import DependsJwtAuth
+from common.security.permission import RequestPermission
+from common.security.rbac import DependsRBAC
+from database.db import CurrentSession
+from database.replica import DependsReadOnly
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    summary="Get operation logs cursor pagination",
+    dependencies=[
+        DependsJwtAuth,
+        DependsCursorPagination,
+        DependsReadOnly,
+    ],
+)
+async def get_pagination_opera_logs(
+    db: CurrentSession,
+    username: Annotated[str | None, Query(description="username")] = None,
+    status: Annotated[int | None, Query(description="status")] = None,
+    ip: Annotated[str | None, Query(description="IP address")] = None,
+) -> ResponseSchemaModel[PageData[GetOperaLogDetail]]:
+    log_select = await opera_log_service.get_select(
+        username=username, status=status, ip=ip
+    )
+    page_data = await cursor_paging_data(
+        db, log_select, count_type=PageCountType.estimate
+    )
+    return response_base.success(data=page_data)
+
+
+@router.delete(
+    "",
+    summary="Batch delete operation logs",
+    dependencies=[
+        Depends(RequestPermission("log:opera:del")),
+        DependsRBAC,
+    ],
+)
+async def delete_opera_log(
+    pk: Annotated[list[int], Query(description="Log ID list")]
+) -> ResponseModel:
+    count = await opera_log_service.delete(pk=pk)
+    if count > 0:
+        return response_base.success()
+    return response_base.fail()
+
+
+@router.delete(
+    "/all",
+    summary="Clear operation logs",
+    dependencies=[
+        Depends(RequestPermission("log:opera:clear")),
+        DependsRBAC,
+    ],
+)
+async def delete_all_opera_logs() -> ResponseModel:
+    count = await opera_log_service.delete_all()
+    if count > 0:
+        return response_base.success()
+    return response_base.fail()
@@ -2,10 +2,14 @@
 # -*- coding: utf-8 -*-
 from fastapi import APIRouter
 
+from app.admin.api.v1.monitor.auth import router as auth_router
+from app.admin.api.v1.monitor.db import router as db_router
 from app.admin.api.v1.monitor.redis import router as redis_router
 from app.admin.api.v1.monitor.server import router as server_router
 
 router = APIRouter(prefix="/monitors")
 
+router.include_router(auth_router, prefix="/auth", tags=["auth monitor"])
+router.include_router(db_router, prefix="/db", tags=["db monitor"])
 router.include_router(redis_router, prefix="/redis", tags=["redis monitor"])
 router.include_router(server_router, prefix="/server", tags=["server monitor"])
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+
+from fastapi import APIRouter, Depends
+
+from common.response.response_schema import ResponseModel, response_base
+from common.security.jwt import DependsJwtAuth
+from common.security.permission import RequestPermission
+from common.security.user_cache import user_cache
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    summary="authentication cache monitoring",
+    dependencies=[
+        Depends(RequestPermission("sys:monitor:auth")),
+        DependsJwtAuth,
+    ],
+)
+async def get_auth_info() -> ResponseModel:
+    # Counters are kept per worker
+    data = {
+        "pid": os.getpid(),
+        "user_cache": user_cache.stats(),
+    }
+    return response_base.success(data=data)
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import os
+
+from fastapi import APIRouter, Depends
+
+from common.response.response_schema import ResponseModel, response_base
+from common.security.jwt import DependsJwtAuth
+from common.security.permission import RequestPermission
+from database.monitor import pool_monitors
+from database.replica import replica_router
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    summary="database pool monitoring",
+    dependencies=[
+        Depends(RequestPermission("sys:monitor:db")),
+        DependsJwtAuth,
+    ],
+)
+async def get_db_info() -> ResponseModel:
+    # Pools and their telemetry are kept per worker
+    data = {
+        "pid": os.getpid(),
+        "engines": {name: monitor.stats() for name, monitor in pool_monitors.items()},
+        "replicas": replica_router.stats(),
+    }
+    return response_base.success(data=data)
@@ -5,6 +5,7 @@ from starlette.concurrency import run_in_threadpool
 
 from common.response.response_schema import ResponseModel, response_base
 from common.security.jwt import DependsJwtAuth
+from common.security.password import password_hash_executor
 from common.security.permission import RequestPermission
 from utils.server_info import server_info
 
@@ -27,5 +28,6 @@ async def get_server_info() -> ResponseModel:
         "sys": await run_in_threadpool(server_info.get_sys_info),
         "disk": await run_in_threadpool(server_info.get_disk_info),
         "service": await run_in_threadpool(server_info.get_service_info),
+        "password_hash": password_hash_executor.stats(),
     }
     return response_base.success(data=data)
@@ -20,6 +20,7 @@ from common.security.jwt import DependsJwtAuth
 from common.security.permission import RequestPermission
 from common.security.rbac import DependsRBAC
 from database.db import CurrentSession
+from database.replica import DependsReadOnly
 
 router = APIRouter()
 
@@ -64,6 +65,7 @@ async def get_data_rule(
     dependencies=[
         DependsJwtAuth,
         DependsPagination,
+        DependsReadOnly,
     ],
 )
 async def get_pagination_data_rules(
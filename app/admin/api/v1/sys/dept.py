@@ -18,6 +18,43 @@ from common.security.rbac import DependsRBAC
 router = APIRouter()
 
 
+@router.get(
+    "/children",
+    summary="Get child departments",
+    description="Lazy loading of the department tree, one level at a time",
+    dependencies=[DependsJwtAuth],
+)
+async def get_dept_children(
+    parent_id: Annotated[
+        int | None,
+        Query(description="parent department ID, root departments if not specified"),
+    ] = None,
+) -> ResponseSchemaModel[list[dict[str, Any]]]:
+    dept = await dept_service.get_dept_children(parent_id=parent_id)
+    return response_base.success(data=dept)
+
+
+@router.get(
+    "/search",
+    summary="Search department tree",
+    description="Get the tree of matching departments and their ancestors",
+    dependencies=[DependsJwtAuth],
+)
+async def search_depts(
+    name: Annotated[str | None, Query(description="department name")] = None,
+    leader: Annotated[str | None, Query(description="department leader")] = None,
+    phone: Annotated[str | None, Query(description="phone")] = None,
+    status: Annotated[int | None, Query(description="status")] = None,
+    limit: Annotated[
+        int, Query(ge=1, le=1000, description="maximum number of matches")
+    ] = 100,
+) -> ResponseSchemaModel[list[dict[str, Any]]]:
+    dept = await dept_service.search_dept_tree(
+        name=name, leader=leader, phone=phone, status=status, limit=limit
+    )
+    return response_base.success(data=dept)
+
+
 @router.get("/{pk}", summary="Get department details", dependencies=[DependsJwtAuth])
 async def get_dept(
     pk: Annotated[int, Path(description="department ID")]
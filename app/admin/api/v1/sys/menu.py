@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 from typing import Annotated, Any
 
-from fastapi import APIRouter, Depends, Path, Query, Request
+from fastapi import APIRouter, Depends, Path, Query, Request, Response
 
 from app.admin.schema.menu import CreateMenuParam, GetMenuDetail, UpdateMenuParam
 from app.admin.service.menu_service import menu_service
@@ -14,6 +14,7 @@ from common.response.response_schema import (
 from common.security.jwt import DependsJwtAuth
 from common.security.permission import RequestPermission
 from common.security.rbac import DependsRBAC
+from database.monitor import QueryBudget
 
 router = APIRouter()
 
@@ -21,13 +22,44 @@ router = APIRouter()
 @router.get(
     "/sidebar",
     summary="Get the user menu sidebar",
-    description="Adapt vben5",
+    description="Adapt vben5, the rendered sidebar is cached per role set",
+    dependencies=[DependsJwtAuth, Depends(QueryBudget(10))],
+    response_model=ResponseSchemaModel[list[dict[str, Any]]],
+)
+async def get_user_sidebar(request: Request) -> Response:
+    content = await menu_service.get_user_menu_tree_json(request=request)
+    return Response(content=content, media_type="application/json")
+
+
+@router.get(
+    "/children",
+    summary="Get child menus",
+    description="Lazy loading of the menu tree, one level at a time",
     dependencies=[DependsJwtAuth],
 )
-async def get_user_sidebar(
-    request: Request,
+async def get_menu_children(
+    parent_id: Annotated[
+        int | None, Query(description="parent menu ID, root menus if not specified")
+    ] = None,
+) -> ResponseSchemaModel[list[dict[str, Any]]]:
+    menu = await menu_service.get_menu_children(parent_id=parent_id)
+    return response_base.success(data=menu)
+
+
+@router.get(
+    "/search",
+    summary="Search menu tree",
+    description="Get the tree of matching menus and their ancestors",
+    dependencies=[DependsJwtAuth],
+)
+async def search_menus(
+    title: Annotated[str | None, Query(description="menu title")] = None,
+    status: Annotated[int | None, Query(description="status")] = None,
+    limit: Annotated[
+        int, Query(ge=1, le=1000, description="maximum number of matches")
+    ] = 100,
 ) -> ResponseSchemaModel[list[dict[str, Any]]]:
-    menu = await menu_service.get_user_menu_tree(request=request)
+    menu = await menu_service.search_menu_tree(title=title, status=status, limit=limit)
     return response_base.success(data=menu)
 
 
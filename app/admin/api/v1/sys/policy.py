@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query
+
+from app.admin.schema.policy import CreatePolicyParam, GetPolicyDetail
+from app.admin.service.policy_service import policy_service
+from common.pagination import DependsPagination, PageData, paging_data
+from common.response.response_schema import (
+    ResponseModel,
+    ResponseSchemaModel,
+    response_base,
+)
+from common.security.jwt import DependsJwtAuth
+from common.security.permission import RequestPermission
+from common.security.rbac import DependsRBAC
+from database.db import CurrentSession
+from database.replica import DependsReadOnly
+
+router = APIRouter()
+
+
+@router.get(
+    "",
+    summary="Get policies pagination",
+    dependencies=[
+        DependsJwtAuth,
+        DependsPagination,
+        DependsReadOnly,
+    ],
+)
+async def get_pagination_policies(
+    db: CurrentSession,
+    role_id: Annotated[int | None, Query(description="Role ID")] = None,
+    path: Annotated[str | None, Query(description="Route path")] = None,
+) -> ResponseSchemaModel[PageData[GetPolicyDetail]]:
+    policy_select = await policy_service.get_select(role_id=role_id, path=path)
+    page_data = await paging_data(db, policy_select)
+    return response_base.success(data=page_data)
+
+
+@router.post(
+    "",
+    summary="Create policy",
+    dependencies=[
+        Depends(RequestPermission("sys:policy:add")),
+        DependsRBAC,
+    ],
+)
+async def create_policy(obj: CreatePolicyParam) -> ResponseModel:
+    await policy_service.create(obj=obj)
+    return response_base.success()
+
+
+@router.delete(
+    "",
+    summary="Batch delete policies",
+    dependencies=[
+        Depends(RequestPermission("sys:policy:del")),
+        DependsRBAC,
+    ],
+)
+async def delete_policy(
+    pk: Annotated[list[int], Query(description="Policy ID list")]
+) -> ResponseModel:
+    count = await policy_service.delete(pk=pk)
+    if count > 0:
+        return response_base.success()
+    return response_base.fail()
@@ -25,6 +25,8 @@ from common.security.jwt import DependsJwtAuth
 from common.security.permission import RequestPermission
 from common.security.rbac import DependsRBAC
 from database.db import CurrentSession
+from database.monitor import QueryBudget
+from database.replica import DependsReadOnly
 
 router = APIRouter()
 
@@ -46,7 +48,9 @@ async def get_user_all_roles(
 
 
 @router.get(
-    "/{pk}/menus", summary="Get all character menus", dependencies=[DependsJwtAuth]
+    "/{pk}/menus",
+    summary="Get all character menus",
+    dependencies=[DependsJwtAuth, Depends(QueryBudget(10))],
 )
 async def get_role_all_menus(
     pk: Annotated[int, Path(description="role ID")],
@@ -58,7 +62,7 @@ async def get_role_all_menus(
 @router.get(
     "/{pk}/rules",
     summary="Get all data rules of the role",
-    dependencies=[DependsJwtAuth],
+    dependencies=[DependsJwtAuth, Depends(QueryBudget(10))],
 )
 async def get_role_all_rules(
     pk: Annotated[int, Path(description="role ID")]
@@ -67,7 +71,11 @@ async def get_role_all_rules(
     return response_base.success(data=rule)
 
 
-@router.get("/{pk}", summary="Get role details", dependencies=[DependsJwtAuth])
+@router.get(
+    "/{pk}",
+    summary="Get role details",
+    dependencies=[DependsJwtAuth, Depends(QueryBudget(10))],
+)
 async def get_role(
     pk: Annotated[int, Path(description="role ID")],
 ) -> ResponseSchemaModel[GetRoleWithRelationDetail]:
@@ -81,6 +89,7 @@ async def get_role(
     dependencies=[
         DependsJwtAuth,
         DependsPagination,
+        DependsReadOnly,
     ],
 )
 async def get_pagination_roles(
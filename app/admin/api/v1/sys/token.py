@@ -1,89 +1,36 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import json
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Path, Query, Request
 
 from app.admin.schema.token import GetTokenDetail, KickOutToken
-from common.enums import StatusType
+from app.admin.service.token_service import token_service
+from common.pagination import DependsPagination, PageData
 from common.response.response_schema import (
     ResponseModel,
     ResponseSchemaModel,
     response_base,
 )
-from common.security.jwt import (
-    DependsJwtAuth,
-    jwt_decode,
-    revoke_token,
-    superuser_verify,
-)
+from common.security.jwt import DependsJwtAuth, revoke_token, superuser_verify
 from common.security.permission import RequestPermission
 from common.security.rbac import DependsRBAC
-from core.conf import settings
-from database.redis import redis_client
 
 router = APIRouter()
 
 
-@router.get("", summary="Get a list of tokens", dependencies=[DependsJwtAuth])
+@router.get(
+    "",
+    summary="Get a list of tokens",
+    dependencies=[
+        DependsJwtAuth,
+        DependsPagination,
+    ],
+)
 async def get_tokens(
     username: Annotated[str | None, Query(description="username")] = None,
-) -> ResponseSchemaModel[list[GetTokenDetail]]:
-    token_keys = await redis_client.keys(f"{settings.TOKEN_REDIS_PREFIX}:*")
-    online_clients = await redis_client.smembers(settings.TOKEN_ONLINE_REDIS_PREFIX)
-    data: list[GetTokenDetail] = []
-
-    def append_token_detail() -> None:
-        data.append(
-            token_detail.model_copy(
-                update={
-                    "username": extra_info.get("username", "Unknown"),
-                    "nickname": extra_info.get("nickname", "Unknown"),
-                    "ip": extra_info.get("ip", "Unknown"),
-                    "os": extra_info.get("os", "Unknown"),
-                    "browser": extra_info.get("browser", "Unknown"),
-                    "device": extra_info.get("device", "Unknown"),
-                    "last_login_time": extra_info.get("last_login_time", "Unknown"),
-                }
-            )
-        )
-
-    for key in token_keys:
-        token = await redis_client.get(key)
-        token_payload = jwt_decode(token)
-        session_uuid = token_payload.session_uuid
-        token_detail = GetTokenDetail(
-            id=token_payload.id,
-            session_uuid=session_uuid,
-            username="Unknown",
-            nickname="Unknown",
-            ip="Unknown",
-            os="Unknown",
-            browser="Unknown",
-            device="Unknown",
-            status=(
-                StatusType.enable
-                if session_uuid in online_clients
-                else StatusType.disable
-            ),
-            last_login_time="",
-            expire_time=token_payload.expire_time,
-        )
-        extra_info = await redis_client.get(
-            f"{settings.TOKEN_EXTRA_INFO_REDIS_PREFIX}:{session_uuid}"
-        )
-        if extra_info:
-            extra_info = json.loads(extra_info)
-            # Check if the token is a swagger token
-            if extra_info.get("swagger") is None:
-                if username is not None:
-                    if username == extra_info.get("username"):
-                        append_token_detail()
-                else:
-                    append_token_detail()
-        else:
-            data.append(token_detail)
+) -> ResponseSchemaModel[PageData[GetTokenDetail]]:
+    data = await token_service.get_tokens(username=username)
     return response_base.success(data=data)
 
 
@@ -25,6 +25,7 @@ from common.security.jwt import DependsJwtAuth
 from common.security.permission import RequestPermission
 from common.security.rbac import DependsRBAC
 from database.db import CurrentSession
+from database.replica import DependsReadOnly, use_primary
 
 router = APIRouter()
 
@@ -40,7 +41,9 @@ async def add_user(
     request: Request, obj: AddUserParam
 ) -> ResponseSchemaModel[GetUserInfoWithRelationDetail]:
     await user_service.add(request=request, obj=obj)
-    data = await user_service.get_userinfo(username=obj.username)
+    # Replicas may not have replayed the new user yet
+    with use_primary():
+        data = await user_service.get_userinfo(username=obj.username)
     return response_base.success(data=data)
 
 
@@ -56,7 +59,7 @@ async def password_reset(request: Request, obj: ResetPasswordParam) -> ResponseM
 async def get_current_user(
     request: Request,
 ) -> ResponseSchemaModel[GetCurrentUserInfoWithRelationDetail]:
-    data = request.user.model_dump()
+    data = request.user.get_current_info()
     return response_base.success(data=data)
 
 
@@ -119,6 +122,7 @@ async def update_avatar(
     dependencies=[
         DependsJwtAuth,
         DependsPagination,
+        DependsReadOnly,
     ],
 )
 async def get_pagination_users(
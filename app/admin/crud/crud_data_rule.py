@@ -5,13 +5,13 @@ from typing import Sequence
 from sqlalchemy import Select, and_, desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import noload
-from sqlalchemy_crud_plus import CRUDPlus
 
 from app.admin.model import DataRule
 from app.admin.schema.data_rule import CreateDataRuleParam, UpdateDataRuleParam
+from common.crud import CRUDBase
 
 
-class CRUDDataRule(CRUDPlus[DataRule]):
+class CRUDDataRule(CRUDBase[DataRule]):
     """CRUD for DataRule model."""
 
     async def get(self, db: AsyncSession, pk: int) -> DataRule | None:
@@ -1,19 +1,23 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import Sequence
+from typing import Any, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import ColumnElement, Row, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from sqlalchemy_crud_plus import CRUDPlus
 
 from app.admin.model import Dept
+from app.admin.model.closure import sys_dept_closure
 from app.admin.schema.dept import CreateDeptParam, UpdateDeptParam
+from common.crud import CRUDTree
 
 
-class CRUDDept(CRUDPlus[Dept]):
+class CRUDDept(CRUDTree[Dept]):
     """CRUD for Dept model."""
 
+    def _filters(self, model: Any) -> list[ColumnElement[bool]]:
+        return [model.del_flag == 0]
+
     async def get(self, db: AsyncSession, dept_id: int) -> Dept | None:
         return await self.select_model_by_column(db, id=dept_id, del_flag=0)
 
@@ -40,13 +44,41 @@ class CRUDDept(CRUDPlus[Dept]):
             filters.update(status=status)
         return await self.select_models_order(db, sort_columns="sort", **filters)
 
+    async def get_search_nodes(
+        self,
+        db: AsyncSession,
+        name: str | None,
+        leader: str | None,
+        phone: str | None,
+        status: int | None,
+        limit: int,
+    ) -> Sequence[Row[tuple[Dept, bool, bool]]]:
+
+        conditions = []
+        if name is not None:
+            conditions.append(self.model.name.like(f"%{name}%"))
+        if leader is not None:
+            conditions.append(self.model.leader.like(f"%{leader}%"))
+        if phone is not None:
+            conditions.append(self.model.phone.startswith(phone))
+        if status is not None:
+            conditions.append(self.model.status == status)
+        return await self.search(db, *conditions, limit=limit)
+
     async def create(self, db: AsyncSession, obj: CreateDeptParam) -> None:
 
-        await self.create_model(db, obj)
+        dept = await self.create_model(db, obj, flush=True)
+        await self.insert_closure(db, dept.id, dept.parent_id)
 
     async def update(self, db: AsyncSession, dept_id: int, obj: UpdateDeptParam) -> int:
 
-        return await self.update_model(db, dept_id, obj)
+        parent_id = await db.scalar(
+            select(self.model.parent_id).where(self.model.id == dept_id)
+        )
+        count = await self.update_model(db, dept_id, obj)
+        if obj.parent_id != parent_id:
+            await self.move_closure(db, dept_id, obj.parent_id)
+        return count
 
     async def delete(self, db: AsyncSession, dept_id: int) -> int:
 
@@ -75,4 +107,4 @@ class CRUDDept(CRUDPlus[Dept]):
         return result.scalars().all()
 
 
-dept_dao: CRUDDept = CRUDDept(Dept)
+dept_dao: CRUDDept = CRUDDept(Dept, sys_dept_closure)
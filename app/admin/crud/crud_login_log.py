@@ -2,13 +2,13 @@
 # -*- coding: utf-8 -*-
 from sqlalchemy import Select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy_crud_plus import CRUDPlus
 
 from app.admin.model import LoginLog
 from app.admin.schema.login_log import CreateLoginLogParam
+from common.crud import CRUDBase
 
 
-class CRUDLoginLog(CRUDPlus[LoginLog]):
+class CRUDLoginLog(CRUDBase[LoginLog]):
     """CRUD for LoginLog model."""
 
     async def get_list(
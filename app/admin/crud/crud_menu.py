@@ -2,16 +2,18 @@
 # -*- coding: utf-8 -*-
 from typing import Sequence
 
-from sqlalchemy import and_, asc, select
+from sqlalchemy import Row, and_, asc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from sqlalchemy_crud_plus import CRUDPlus
 
 from app.admin.model import Menu
+from app.admin.model.closure import sys_menu_closure
+from app.admin.model.m2m import sys_role_menu
 from app.admin.schema.menu import CreateMenuParam, UpdateMenuParam
+from common.crud import CRUDTree
 
 
-class CRUDMenu(CRUDPlus[Menu]):
+class CRUDMenu(CRUDTree[Menu]):
     """CRUD for Menu model."""
 
     async def get(self, db: AsyncSession, menu_id: int) -> Menu | None:
@@ -45,13 +47,49 @@ class CRUDMenu(CRUDPlus[Menu]):
         menu = await db.execute(stmt)
         return menu.scalars().all()
 
+    async def get_role_set_menus(
+        self, db: AsyncSession, superuser: bool, role_ids: list[int]
+    ) -> Sequence[Menu]:
+
+        stmt = select(self.model).order_by(asc(self.model.sort))
+        filters = [self.model.type.in_([0, 1])]
+        if not superuser:
+            filters.append(
+                self.model.id.in_(
+                    select(sys_role_menu.c.menu_id).where(
+                        sys_role_menu.c.role_id.in_(role_ids)
+                    )
+                )
+            )
+        stmt = stmt.where(and_(*filters))
+        menu = await db.execute(stmt)
+        return menu.scalars().all()
+
+    async def get_search_nodes(
+        self, db: AsyncSession, title: str | None, status: int | None, limit: int
+    ) -> Sequence[Row[tuple[Menu, bool, bool]]]:
+
+        conditions = []
+        if title is not None:
+            conditions.append(self.model.title.like(f"%{title}%"))
+        if status is not None:
+            conditions.append(self.model.status == status)
+        return await self.search(db, *conditions, limit=limit)
+
     async def create(self, db: AsyncSession, obj: CreateMenuParam) -> None:
 
-        await self.create_model(db, obj)
+        menu = await self.create_model(db, obj, flush=True)
+        await self.insert_closure(db, menu.id, menu.parent_id)
 
     async def update(self, db: AsyncSession, menu_id: int, obj: UpdateMenuParam) -> int:
 
-        return await self.update_model(db, menu_id, obj)
+        parent_id = await db.scalar(
+            select(self.model.parent_id).where(self.model.id == menu_id)
+        )
+        count = await self.update_model(db, menu_id, obj)
+        if obj.parent_id != parent_id:
+            await self.move_closure(db, menu_id, obj.parent_id)
+        return count
 
     async def delete(self, db: AsyncSession, menu_id: int) -> int:
 
@@ -69,4 +107,4 @@ class CRUDMenu(CRUDPlus[Menu]):
         return menu.children
 
 
-menu_dao: CRUDMenu = CRUDMenu(Menu)
+menu_dao: CRUDMenu = CRUDMenu(Menu, sys_menu_closure)
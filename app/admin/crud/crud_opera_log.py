@@ -2,13 +2,13 @@
 # -*- coding: utf-8 -*-
 from sqlalchemy import Select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy_crud_plus import CRUDPlus
 
 from app.admin.model import OperaLog
 from app.admin.schema.opera_log import CreateOperaLogParam
+from common.crud import CRUDBase
 
 
-class CRUDOperaLogDao(CRUDPlus[OperaLog]):
+class CRUDOperaLogDao(CRUDBase[OperaLog]):
     """CRUD for Operation Log model."""
 
     async def get_list(
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Sequence
+
+from sqlalchemy import Row, Select, and_, desc, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.admin.model import Policy, Role
+from app.admin.schema.policy import CreatePolicyParam
+from common.crud import CRUDBase
+from common.enums import StatusType
+
+
+class CRUDPolicy(CRUDBase[Policy]):
+    """CRUD for Policy model."""
+
+    async def get_list(self, role_id: int | None, path: str | None) -> Select:
+        """
+        Get a list of policies.
+
+        :param role_id: role ID
+        :param path: route path
+        :return:
+        """
+        stmt = select(self.model).order_by(desc(self.model.created_time))
+
+        filters = []
+        if role_id is not None:
+            filters.append(self.model.role_id == role_id)
+        if path is not None:
+            filters.append(self.model.path.like(f"%{path}%"))
+
+        if filters:
+            stmt = stmt.where(and_(*filters))
+
+        return stmt
+
+    async def get_enabled(
+        self, db: AsyncSession
+    ) -> Sequence[Row[tuple[int, str, str]]]:
+        """
+        Get (role ID, path, method) of all policies whose role is enabled.
+
+        :param db: db session
+        :return:
+        """
+        stmt = (
+            select(self.model.role_id, self.model.path, self.model.method)
+            .join(Role, Role.id == self.model.role_id)
+            .where(Role.status == StatusType.enable)
+        )
+        result = await db.execute(stmt)
+        return result.all()
+
+    async def create(self, db: AsyncSession, obj: CreatePolicyParam) -> None:
+        """
+        Create a new policy.
+
+        :param db: db session
+        :param obj: policy parameters
+        :return:
+        """
+        await self.create_model(db, obj)
+
+    async def delete(self, db: AsyncSession, pk: list[int]) -> int:
+        """
+        Delete policies.
+
+        :param db: db session
+        :param pk: policy ID list
+        :return:
+        """
+        return await self.delete_model_by_column(db, allow_multiple=True, id__in=pk)
+
+
+policy_dao: CRUDPolicy = CRUDPolicy(Policy)
@@ -5,7 +5,6 @@ from typing import Sequence
 from sqlalchemy import Select, and_, desc, select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import noload, selectinload
-from sqlalchemy_crud_plus import CRUDPlus
 
 from app.admin.model import DataRule, Menu, Role, User
 from app.admin.schema.role import (
@@ -14,9 +13,10 @@ from app.admin.schema.role import (
     UpdateRoleParam,
     UpdateRoleRuleParam,
 )
+from common.crud import CRUDBase, load_by_ids
 
 
-class CRUDRole(CRUDPlus[Role]):
+class CRUDRole(CRUDBase[Role]):
     """CRUD for Role model."""
 
     async def get(self, db: AsyncSession, role_id: int) -> Role | None:
@@ -83,9 +83,8 @@ class CRUDRole(CRUDPlus[Role]):
     ) -> int:
 
         current_role = await self.get_with_relation(db, role_id)
-        stmt = select(Menu).where(Menu.id.in_(menu_ids.menus))
-        menus = await db.execute(stmt)
-        current_role.menus = menus.scalars().all()
+        menus = await load_by_ids(db, Menu, menu_ids.menus)
+        current_role.menus = menus.items
         return len(current_role.menus)
 
     async def update_rules(
@@ -93,9 +92,8 @@ class CRUDRole(CRUDPlus[Role]):
     ) -> int:
 
         current_role = await self.get_with_relation(db, role_id)
-        stmt = select(DataRule).where(DataRule.id.in_(rule_ids.rules))
-        rules = await db.execute(stmt)
-        current_role.rules = rules.scalars().all()
+        rules = await load_by_ids(db, DataRule, rule_ids.rules)
+        current_role.rules = rules.items
         return len(current_role.rules)
 
     async def delete(self, db: AsyncSession, role_id: list[int]) -> int:
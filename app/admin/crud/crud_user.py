@@ -1,25 +1,40 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+from typing import Any
+
 import bcrypt
-from sqlalchemy import and_, desc, select
+from sqlalchemy import (
+    ColumnElement,
+    Select,
+    Table,
+    Text,
+    and_,
+    cast,
+    desc,
+    func,
+    literal,
+    select,
+    text,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import noload, selectinload
-from sqlalchemy.sql import Select
-from sqlalchemy_crud_plus import CRUDPlus
 
-from app.admin.model import Dept, Role, User
+from app.admin.model import DataRule, Dept, Menu, Role, User
+from app.admin.model.m2m import sys_role_data_rule, sys_role_menu, sys_user_role
 from app.admin.schema.user import (
     AddUserParam,
     AvatarParam,
+    GetUserInfoWithRelationDetail,
     RegisterUserParam,
     UpdateUserParam,
     UpdateUserRoleParam,
 )
-from common.security.jwt import get_hash_password
+from common.crud import CRUDBase, load_by_ids
+from common.security.jwt import get_hash_password_async
 from utils.timezone import timezone
 
 
-class CRUDUser(CRUDPlus[User]):
+class CRUDUser(CRUDBase[User]):
     """CRUD for User model."""
 
     async def get(self, db: AsyncSession, user_id: int) -> User | None:
@@ -46,7 +61,7 @@ class CRUDUser(CRUDPlus[User]):
 
         if not social:
             salt = bcrypt.gensalt()
-            obj.password = get_hash_password(obj.password, salt)
+            obj.password = await get_hash_password_async(obj.password, salt)
             dict_obj = obj.model_dump()
             dict_obj.update({"is_staff": True, "salt": salt})
         else:
@@ -58,15 +73,13 @@ class CRUDUser(CRUDPlus[User]):
     async def add(self, db: AsyncSession, obj: AddUserParam) -> None:
 
         salt = bcrypt.gensalt()
-        obj.password = get_hash_password(obj.password, salt)
+        obj.password = await get_hash_password_async(obj.password, salt)
         dict_obj = obj.model_dump(exclude={"roles"})
         dict_obj.update({"salt": salt})
         new_user = self.model(**dict_obj)
 
-        role_list = []
-        for role_id in obj.roles:
-            role_list.append(await db.get(Role, role_id))
-        new_user.roles.extend(role_list)
+        roles = await load_by_ids(db, Role, obj.roles)
+        new_user.roles.extend(roles.items)
 
         db.add(new_user)
 
@@ -84,10 +97,8 @@ class CRUDUser(CRUDPlus[User]):
         for i in list(input_user.roles):
             input_user.roles.remove(i)
 
-        role_list = []
-        for role_id in obj.roles:
-            role_list.append(await db.get(Role, role_id))
-        input_user.roles.extend(role_list)
+        roles = await load_by_ids(db, Role, obj.roles)
+        input_user.roles.extend(roles.items)
 
     async def update_avatar(
         self, db: AsyncSession, input_user: int, avatar: AvatarParam
@@ -209,5 +220,174 @@ class CRUDUser(CRUDPlus[User]):
         user = await db.execute(stmt)
         return user.scalars().first()
 
+    async def get_relation_detail(
+        self,
+        db: AsyncSession,
+        *,
+        user_id: int | None = None,
+        username: str | None = None,
+    ) -> GetUserInfoWithRelationDetail | None:
+        """
+        Get user with department, roles, menus and data rules, bypassing the ORM
+
+        On PostgreSQL the whole user is aggregated into one JSON document by a single statement,
+        other dialects fall back to two plain row queries
+
+        :param db: db session
+        :param user_id: user ID
+        :param username: username
+        :return:
+        """
+        filters = []
+        if user_id:
+            filters.append(User.id == user_id)
+        if username:
+            filters.append(User.username == username)
+
+        if db.get_bind().dialect.name == "postgresql":
+            stmt = select(cast(_user_json(), Text))
+            if filters:
+                stmt = stmt.where(and_(*filters))
+            user = (await db.execute(stmt.limit(1))).scalar()
+            if user is None:
+                return None
+            return GetUserInfoWithRelationDetail.model_validate_json(user)
+        return await _get_relation_detail_rows(db, filters)
+
+
+def _json_object(table: Table, exclude: tuple[str, ...] = (), **extra: Any) -> Any:
+    """
+    Build a JSON object of table columns
+
+    :param table: Table
+    :param exclude: Excluded column names
+    :param extra: Additional keys
+    :return:
+    """
+    args = []
+    for column in table.columns:
+        if column.name not in exclude:
+            args.extend((literal(column.name), column))
+    for key, value in extra.items():
+        args.extend((literal(key), value))
+    return func.json_build_object(*args)
+
+
+def _json_array(stmt: Select) -> Any:
+    """
+    Aggregate a single-column select of JSON objects into a JSON array, empty if no rows
+
+    :param stmt: Select statement
+    :return:
+    """
+    return stmt.with_only_columns(
+        func.coalesce(func.json_agg(stmt.selected_columns[0]), text("'[]'::json"))
+    ).scalar_subquery()
+
+
+def _user_json() -> Any:
+    """Build a JSON object of the user with its relations, correlated to `sys_user`"""
+    menus = _json_array(
+        select(_json_object(Menu.__table__))
+        .join(sys_role_menu, sys_role_menu.c.menu_id == Menu.id)
+        .where(sys_role_menu.c.role_id == Role.id)
+    )
+    rules = _json_array(
+        select(_json_object(DataRule.__table__))
+        .join(sys_role_data_rule, sys_role_data_rule.c.data_rule_id == DataRule.id)
+        .where(sys_role_data_rule.c.role_id == Role.id)
+    )
+    roles = _json_array(
+        select(_json_object(Role.__table__, menus=menus, rules=rules))
+        .join(sys_user_role, sys_user_role.c.role_id == Role.id)
+        .where(sys_user_role.c.user_id == User.id)
+    )
+    dept = (
+        select(_json_object(Dept.__table__)).where(Dept.id == User.dept_id)
+    ).scalar_subquery()
+    return _json_object(
+        User.__table__, exclude=("password", "salt"), dept=dept, roles=roles
+    )
+
+
+def _row_dict(row: Any, table: Table, prefix: str = "") -> dict[str, Any]:
+    """
+    Get table columns of a result row as a dict
+
+    :param row: Result row mapping
+    :param table: Table
+    :param prefix: Column label prefix
+    :return:
+    """
+    return {column.name: row[f"{prefix}{column.name}"] for column in table.columns}
+
+
+async def _get_relation_detail_rows(
+    db: AsyncSession, filters: list[ColumnElement[bool]]
+) -> GetUserInfoWithRelationDetail | None:
+    """
+    Portable fallback of `get_relation_detail`, roles with menus are fetched in one query and data
+    rules in another, so that menus and rules are not multiplied with each other
+
+    :param db: db session
+    :param filters: User filters
+    :return:
+    """
+    user_columns = [
+        c for c in User.__table__.columns if c.name not in ("password", "salt")
+    ]
+    stmt = (
+        select(
+            *user_columns,
+            *[c.label(f"dept__{c.name}") for c in Dept.__table__.columns],
+            *[c.label(f"role__{c.name}") for c in Role.__table__.columns],
+            *[c.label(f"menu__{c.name}") for c in Menu.__table__.columns],
+        )
+        .outerjoin(Dept, Dept.id == User.dept_id)
+        .outerjoin(sys_user_role, sys_user_role.c.user_id == User.id)
+        .outerjoin(Role, Role.id == sys_user_role.c.role_id)
+        .outerjoin(sys_role_menu, sys_role_menu.c.role_id == Role.id)
+        .outerjoin(Menu, Menu.id == sys_role_menu.c.menu_id)
+    )
+    if filters:
+        stmt = stmt.where(and_(*filters))
+    rows = (await db.execute(stmt)).mappings().all()
+    if not rows:
+        return None
+
+    user = {column.name: rows[0][column.name] for column in user_columns}
+    user["dept"] = (
+        _row_dict(rows[0], Dept.__table__, "dept__")
+        if rows[0]["dept__id"] is not None
+        else None
+    )
+    roles: dict[int, dict[str, Any]] = {}
+    for row in rows:
+        # Only the first user is returned, as with a single JSON document
+        if row["id"] != user["id"] or row["role__id"] is None:
+            continue
+        role = roles.get(row["role__id"])
+        if role is None:
+            role = roles[row["role__id"]] = _row_dict(row, Role.__table__, "role__")
+            role["menus"] = []
+            role["rules"] = []
+        if row["menu__id"] is not None:
+            role["menus"].append(_row_dict(row, Menu.__table__, "menu__"))
+    if roles:
+        rule_stmt = (
+            select(
+                sys_role_data_rule.c.role_id.label("rule__role_id"),
+                *DataRule.__table__.columns,
+            )
+            .join(DataRule, DataRule.id == sys_role_data_rule.c.data_rule_id)
+            .where(sys_role_data_rule.c.role_id.in_(roles))
+        )
+        for row in (await db.execute(rule_stmt)).mappings():
+            roles[row["rule__role_id"]]["rules"].append(
+                _row_dict(row, DataRule.__table__)
+            )
+    user["roles"] = list(roles.values())
+    return GetUserInfoWithRelationDetail.model_validate(user)
+
 
 user_dao: CRUDUser = CRUDUser(User)
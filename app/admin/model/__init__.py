@@ -5,6 +5,7 @@ from app.admin.model.dept import Dept
 from app.admin.model.login_log import LoginLog
 from app.admin.model.menu import Menu
 from app.admin.model.opera_log import OperaLog
+from app.admin.model.policy import Policy
 from app.admin.model.role import Role
 from app.admin.model.user import User
 from app.admin.model.user_social import UserSocial
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from sqlalchemy import Column, ForeignKey, Index, Integer, Table
+
+from common.model import MappedBase
+
+# Closure tables hold one row per (ancestor, descendant) pair of a hierarchy, including each node
+# paired with itself at depth 0, so subtrees and ancestors are resolved by a single join
+
+sys_dept_closure = Table(
+    "sys_dept_closure",
+    MappedBase.metadata,
+    Column(
+        "ancestor_id",
+        Integer,
+        ForeignKey("sys_dept.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="ancestor department ID",
+    ),
+    Column(
+        "descendant_id",
+        Integer,
+        ForeignKey("sys_dept.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="descendant department ID",
+    ),
+    Column(
+        "depth", Integer, nullable=False, comment="distance between the departments"
+    ),
+    Index("ix_sys_dept_closure_descendant_id_depth", "descendant_id", "depth"),
+)
+
+sys_menu_closure = Table(
+    "sys_menu_closure",
+    MappedBase.metadata,
+    Column(
+        "ancestor_id",
+        Integer,
+        ForeignKey("sys_menu.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="ancestor menu ID",
+    ),
+    Column(
+        "descendant_id",
+        Integer,
+        ForeignKey("sys_menu.id", ondelete="CASCADE"),
+        primary_key=True,
+        comment="descendant menu ID",
+    ),
+    Column("depth", Integer, nullable=False, comment="distance between the menus"),
+    Index("ix_sys_menu_closure_descendant_id_depth", "descendant_id", "depth"),
+)
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 from datetime import datetime
 
-from sqlalchemy import DateTime, String
+from sqlalchemy import DateTime, Index, String
 from sqlalchemy.dialects.mysql import LONGTEXT
 from sqlalchemy.dialects.postgresql import TEXT
 from sqlalchemy.orm import Mapped, mapped_column
@@ -15,6 +15,8 @@ class LoginLog(DataClassBase):
     """Login log model."""
 
     __tablename__ = "sys_login_log"
+    # Keyset pagination seeks on (created_time, id)
+    __table_args__ = (Index("ix_sys_login_log_created_time_id", "created_time", "id"),)
 
     id: Mapped[id_key] = mapped_column(init=False)
     user_uuid: Mapped[str] = mapped_column(String(50), comment="user uuid")
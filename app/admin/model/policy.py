@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from sqlalchemy import ForeignKey, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from common.model import Base, id_key
+
+
+class Policy(Base):
+    """RBAC policy model."""
+
+    __tablename__ = "sys_policy"
+
+    id: Mapped[id_key] = mapped_column(init=False)
+    role_id: Mapped[int] = mapped_column(
+        ForeignKey("sys_role.id", ondelete="CASCADE"), index=True, comment="role ID"
+    )
+    path: Mapped[str] = mapped_column(
+        String(500), comment="route path template, * matches a segment, ** the rest"
+    )
+    method: Mapped[str] = mapped_column(
+        String(10), comment="request method, * matches any method"
+    )
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from pydantic import ConfigDict, Field
+
+from common.schema import SchemaBase
+
+
+class PolicySchemaBase(SchemaBase):
+    """Policy schema base"""
+
+    role_id: int = Field(description="Role ID")
+    path: str = Field(
+        description="Route path template, * matches a segment and a trailing ** the rest"
+    )
+    method: str = Field(
+        pattern=r"^(\*|GET|POST|PUT|DELETE|PATCH|OPTIONS)$",
+        description="Request method, * matches any method",
+    )
+
+
+class CreatePolicyParam(PolicySchemaBase):
+    """Create policy parameters"""
+
+
+class GetPolicyDetail(PolicySchemaBase):
+    """Policy details"""
+
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int = Field(description="Policy ID")
+    created_time: datetime = Field(description="Creation Time")
+    updated_time: datetime | None = Field(None, description="Update Time")
@@ -114,9 +114,11 @@ class GetCurrentUserInfoWithRelationDetail(GetUserInfoWithRelationDetail):
     def handle(cls, data: Any) -> Self:
         """Process department and role data"""
         dept = data["dept"]
-        if dept:
+        if isinstance(dept, dict):
             data["dept"] = dept["name"]
         roles = data["roles"]
         if roles:
-            data["roles"] = [role["name"] for role in roles]
+            data["roles"] = [
+                role["name"] if isinstance(role, dict) else role for role in roles
+            ]
         return data
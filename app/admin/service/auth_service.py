@@ -20,9 +20,12 @@ from common.security.jwt import (
     create_new_token,
     create_refresh_token,
     get_token,
-    jwt_decode,
-    password_verify,
+    password_verify_async,
+    revoke_token,
+    revoke_user_tokens,
+    token_decode,
 )
+from common.security.session import session_registry
 from core.conf import settings
 from database.db import AsyncSessionLocal
 from database.redis import redis_client
@@ -52,7 +55,7 @@ class AuthService:
         if user.password is None:
             raise errors.AuthorizationError(msg="Username or password is incorrect")
         else:
-            if not password_verify(password, user.password):
+            if not await password_verify_async(password, user.password):
                 raise errors.AuthorizationError(msg="Username or password is incorrect")
 
         if not user.status:
@@ -192,7 +195,7 @@ class AuthService:
                 msg="Refresh Token has expired, please log in again"
             )
         try:
-            user_id = jwt_decode(refresh_token).id
+            user_id = token_decode(refresh_token).id
         except Exception:
             raise errors.TokenError(msg="Invalid Refresh Token")
         async with AsyncSessionLocal() as db:
@@ -233,25 +236,16 @@ class AuthService:
         :return:
         """
         token = get_token(request)
-        token_payload = jwt_decode(token)
+        token_payload = token_decode(token)
         user_id = token_payload.id
         refresh_token = request.cookies.get(settings.COOKIE_REFRESH_TOKEN_KEY)
         response.delete_cookie(settings.COOKIE_REFRESH_TOKEN_KEY)
         if request.user.is_multi_login:
-            await redis_client.delete(
-                f"{settings.TOKEN_REDIS_PREFIX}:{user_id}:{token_payload.session_uuid}"
-            )
+            await revoke_token(str(user_id), token_payload.session_uuid)
             if refresh_token:
-                await redis_client.delete(
-                    f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{user_id}:{refresh_token}"
-                )
+                await session_registry.revoke_refresh(user_id, refresh_token)
         else:
-            key_prefix = [
-                f"{settings.TOKEN_REDIS_PREFIX}:{user_id}:",
-                f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{user_id}:",
-            ]
-            for prefix in key_prefix:
-                await redis_client.delete_prefix(prefix)
+            await revoke_user_tokens(user_id)
 
 
 auth_service: AuthService = AuthService()
@@ -9,9 +9,11 @@ from app.admin.crud.crud_role import role_dao
 from app.admin.model import DataRule
 from app.admin.schema.data_rule import CreateDataRuleParam, UpdateDataRuleParam
 from common.exception import errors
+from common.security.permission import get_data_rule_column
+from common.security.user_cache import user_cache
 from core.conf import settings
 from database.db import AsyncSessionLocal
-from database.redis import redis_client
+from database.replica import read_only
 from utils.import_parse import dynamic_import_data_model
 
 
@@ -81,6 +83,7 @@ class DataRuleService:
         return await data_rule_dao.get_list(name=name)
 
     @staticmethod
+    @read_only
     async def get_all() -> Sequence[DataRule]:
         """Get all data rules"""
         async with AsyncSessionLocal() as db:
@@ -99,6 +102,7 @@ class DataRuleService:
             data_rule = await data_rule_dao.get_by_name(db, obj.name)
             if data_rule:
                 raise errors.ForbiddenError(msg="Data rule already exists")
+            get_data_rule_column(obj.model, obj.column)
             await data_rule_dao.create(db, obj)
 
     @staticmethod
@@ -114,13 +118,10 @@ class DataRuleService:
             data_rule = await data_rule_dao.get(db, pk)
             if not data_rule:
                 raise errors.NotFoundError(msg="Data rule does not exist")
+            get_data_rule_column(obj.model, obj.column)
             count = await data_rule_dao.update(db, pk, obj)
-            for role in await data_rule.awaitable_attrs.roles:
-                for user in await role.awaitable_attrs.users:
-                    await redis_client.delete(
-                        f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}"
-                    )
-            return count
+        await user_cache.bump("rule")
+        return count
 
     @staticmethod
     async def delete(*, pk: list[int]) -> int:
@@ -132,15 +133,8 @@ class DataRuleService:
         """
         async with AsyncSessionLocal.begin() as db:
             count = await data_rule_dao.delete(db, pk)
-            for _pk in pk:
-                data_rule = await data_rule_dao.get(db, _pk)
-                if data_rule:
-                    for role in await data_rule.awaitable_attrs.roles:
-                        for user in await role.awaitable_attrs.users:
-                            await redis_client.delete(
-                                f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}"
-                            )
-            return count
+        await user_cache.bump("rule")
+        return count
 
 
 data_rule_service: DataRuleService = DataRuleService()
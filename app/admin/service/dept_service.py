@@ -6,10 +6,10 @@ from app.admin.crud.crud_dept import dept_dao
 from app.admin.model import Dept
 from app.admin.schema.dept import CreateDeptParam, UpdateDeptParam
 from common.exception import errors
-from core.conf import settings
+from common.security.user_cache import user_cache
 from database.db import AsyncSessionLocal
-from database.redis import redis_client
-from utils.build_tree import get_tree_data
+from database.replica import read_only
+from utils.build_tree import get_lazy_tree_nodes, get_tree_data, traversal_to_tree
 
 
 class DeptService:
@@ -30,6 +30,7 @@ class DeptService:
             return dept
 
     @staticmethod
+    @read_only
     async def get_dept_tree(
         *, name: str | None, leader: str | None, phone: str | None, status: int | None
     ) -> list[dict[str, Any]]:
@@ -49,6 +50,45 @@ class DeptService:
             tree_data = get_tree_data(dept_select)
             return tree_data
 
+    @staticmethod
+    @read_only
+    async def get_dept_children(*, parent_id: int | None) -> list[dict[str, Any]]:
+        """
+        Get child departments, with whether each of them has children
+
+        :param parent_id: Parent department ID, root departments if not specified
+        :return:
+        """
+        async with AsyncSessionLocal() as db:
+            dept_select = await dept_dao.get_children_nodes(db, parent_id)
+            return get_lazy_tree_nodes(dept_select)
+
+    @staticmethod
+    @read_only
+    async def search_dept_tree(
+        *,
+        name: str | None,
+        leader: str | None,
+        phone: str | None,
+        status: int | None,
+        limit: int,
+    ) -> list[dict[str, Any]]:
+        """
+        Search departments, get the tree of matching departments and their ancestors
+
+        :param name: Department name
+        :param leader: Department leader
+        :param phone: Contact phone
+        :param status: Status
+        :param limit: Maximum number of matching departments
+        :return:
+        """
+        async with AsyncSessionLocal() as db:
+            dept_select = await dept_dao.get_search_nodes(
+                db, name=name, leader=leader, phone=phone, status=status, limit=limit
+            )
+            return traversal_to_tree(get_lazy_tree_nodes(dept_select))
+
     @staticmethod
     async def create(*, obj: CreateDeptParam) -> None:
         """
@@ -89,8 +129,13 @@ class DeptService:
                     raise errors.NotFoundError(msg="Parent department does not exist")
             if obj.parent_id == dept.id:
                 raise errors.ForbiddenError(msg="Cannot associate itself as a parent")
+            if obj.parent_id and await dept_dao.is_descendant(db, pk, obj.parent_id):
+                raise errors.ForbiddenError(
+                    msg="Cannot associate a sub-department as a parent"
+                )
             count = await dept_dao.update(db, pk, obj)
-            return count
+        await user_cache.bump("dept")
+        return count
 
     @staticmethod
     async def delete(*, pk: int) -> int:
@@ -104,15 +149,13 @@ class DeptService:
             dept = await dept_dao.get_with_relation(db, pk)
             if dept.users:
                 raise errors.ForbiddenError(msg="Department has users, cannot delete")
-            children = await dept_dao.get_children(db, pk)
-            if children:
+            if await dept_dao.has_children(db, pk):
                 raise errors.ForbiddenError(
                     msg="Department has sub-departments, cannot delete"
                 )
             count = await dept_dao.delete(db, pk)
-            for user in dept.users:
-                await redis_client.delete(f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}")
-            return count
+        await user_cache.bump("dept")
+        return count
 
 
 dept_service: DeptService = DeptService()
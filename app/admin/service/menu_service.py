@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 from typing import Any
 
+import msgspec
 from fastapi import Request
 
 from app.admin.crud.crud_menu import menu_dao
@@ -9,10 +10,17 @@ from app.admin.crud.crud_role import role_dao
 from app.admin.model import Menu
 from app.admin.schema.menu import CreateMenuParam, UpdateMenuParam
 from common.exception import errors
-from core.conf import settings
+from common.response.response_schema import ResponseModel
+from common.security.menu_cache import menu_tree_cache
+from common.security.user_cache import user_cache
 from database.db import AsyncSessionLocal
-from database.redis import redis_client
-from utils.build_tree import get_tree_data, get_vben5_tree_data
+from database.replica import read_only, use_primary
+from utils.build_tree import (
+    get_lazy_tree_nodes,
+    get_tree_data,
+    get_vben5_tree_data,
+    traversal_to_tree,
+)
 
 
 class MenuService:
@@ -33,6 +41,7 @@ class MenuService:
             return menu
 
     @staticmethod
+    @read_only
     async def get_menu_tree(
         *, title: str | None, status: int | None
     ) -> list[dict[str, Any]]:
@@ -49,6 +58,39 @@ class MenuService:
             return menu_tree
 
     @staticmethod
+    @read_only
+    async def get_menu_children(*, parent_id: int | None) -> list[dict[str, Any]]:
+        """
+        Get child menus, with whether each of them has children
+
+        :param parent_id: Parent menu ID, root menus if not specified
+        :return:
+        """
+        async with AsyncSessionLocal() as db:
+            menu_select = await menu_dao.get_children_nodes(db, parent_id)
+            return get_lazy_tree_nodes(menu_select)
+
+    @staticmethod
+    @read_only
+    async def search_menu_tree(
+        *, title: str | None, status: int | None, limit: int
+    ) -> list[dict[str, Any]]:
+        """
+        Search menus, get the tree of matching menus and their ancestors
+
+        :param title: Menu title
+        :param status: Status
+        :param limit: Maximum number of matching menus
+        :return:
+        """
+        async with AsyncSessionLocal() as db:
+            menu_select = await menu_dao.get_search_nodes(
+                db, title=title, status=status, limit=limit
+            )
+            return traversal_to_tree(get_lazy_tree_nodes(menu_select))
+
+    @staticmethod
+    @read_only
     async def get_role_menu_tree(*, pk: int) -> list[dict[str, Any]]:
         """
         Get role menu tree structure
@@ -66,25 +108,36 @@ class MenuService:
             return menu_tree
 
     @staticmethod
-    async def get_user_menu_tree(*, request: Request) -> list[dict[str, Any]]:
+    async def get_user_menu_tree_json(*, request: Request) -> bytes:
         """
-        Get user menu tree structure
+        Get user menu tree structure as an encoded success response, cached per role set
+
+        Cached trees are shared by every user of the role set, so they are rendered from the role
+        menus on the primary rather than from the menus of a possibly outdated principal
 
         :param request: FastAPI request object
         :return:
         """
-        async with AsyncSessionLocal() as db:
-            roles = request.user.roles
-            menu_ids = []
+        is_superuser = request.user.is_superuser
+        role_ids = sorted(request.user.role_ids)
+
+        async def render() -> bytes:
             menu_tree = []
-            if roles:
-                for role in roles:
-                    menu_ids.extend([menu.id for menu in role.menus])
-                menu_select = await menu_dao.get_role_menus(
-                    db, request.user.is_superuser, menu_ids
-                )
-                menu_tree = get_vben5_tree_data(menu_select)
-            return menu_tree
+            if role_ids:
+                with use_primary():
+                    async with AsyncSessionLocal() as db:
+                        menu_select = await menu_dao.get_role_set_menus(
+                            db, is_superuser, role_ids
+                        )
+                        menu_tree = get_vben5_tree_data(menu_select)
+            return msgspec.json.encode(
+                ResponseModel(data=menu_tree).model_dump(mode="json")
+            )
+
+        if not role_ids:
+            return await render()
+        role_key = menu_tree_cache.role_key(is_superuser, role_ids)
+        return await menu_tree_cache.get(role_key, render)
 
     @staticmethod
     async def create(*, obj: CreateMenuParam) -> None:
@@ -103,6 +156,7 @@ class MenuService:
                 if not parent_menu:
                     raise errors.NotFoundError(msg="Parent menu does not exist")
             await menu_dao.create(db, obj)
+        await menu_tree_cache.bump()
 
     @staticmethod
     async def update(*, pk: int, obj: UpdateMenuParam) -> int:
@@ -126,13 +180,14 @@ class MenuService:
                     raise errors.NotFoundError(msg="Parent menu does not exist")
             if obj.parent_id == menu.id:
                 raise errors.ForbiddenError(msg="Cannot associate itself as a parent")
+            if obj.parent_id and await menu_dao.is_descendant(db, pk, obj.parent_id):
+                raise errors.ForbiddenError(
+                    msg="Cannot associate a sub-menu as a parent"
+                )
             count = await menu_dao.update(db, pk, obj)
-            for role in await menu.awaitable_attrs.roles:
-                for user in await role.awaitable_attrs.users:
-                    await redis_client.delete(
-                        f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}"
-                    )
-            return count
+        await user_cache.bump("menu")
+        await menu_tree_cache.bump()
+        return count
 
     @staticmethod
     async def delete(*, pk: int) -> int:
@@ -143,18 +198,12 @@ class MenuService:
         :return:
         """
         async with AsyncSessionLocal.begin() as db:
-            children = await menu_dao.get_children(db, pk)
-            if children:
+            if await menu_dao.has_children(db, pk):
                 raise errors.ForbiddenError(msg="Menu has sub-menus, cannot delete")
-            menu = await menu_dao.get(db, pk)
             count = await menu_dao.delete(db, pk)
-            if menu:
-                for role in await menu.awaitable_attrs.roles:
-                    for user in await role.awaitable_attrs.users:
-                        await redis_client.delete(
-                            f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}"
-                        )
-            return count
+        await user_cache.bump("menu")
+        await menu_tree_cache.bump()
+        return count
 
 
 menu_service: MenuService = MenuService()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from sqlalchemy import Select
+
+from app.admin.crud.crud_policy import policy_dao
+from app.admin.crud.crud_role import role_dao
+from app.admin.schema.policy import CreatePolicyParam
+from common.exception import errors
+from common.security.policy import policy_engine
+from database.db import AsyncSessionLocal
+
+
+class PolicyService:
+    """Policy Service Class"""
+
+    @staticmethod
+    async def get_select(*, role_id: int | None, path: str | None) -> Select:
+        """
+        Get policy list query conditions
+
+        :param role_id: Role ID
+        :param path: Route path
+        :return:
+        """
+        return await policy_dao.get_list(role_id=role_id, path=path)
+
+    @staticmethod
+    async def create(*, obj: CreatePolicyParam) -> None:
+        """
+        Create policy
+
+        :param obj: Policy creation parameters
+        :return:
+        """
+        segments = policy_engine.split(obj.path)
+        if "**" in segments[:-1]:
+            raise errors.ForbiddenError(msg="** is only allowed at the end of the path")
+        async with AsyncSessionLocal.begin() as db:
+            role = await role_dao.get(db, obj.role_id)
+            if not role:
+                raise errors.NotFoundError(msg="Role does not exist")
+            await policy_dao.create(db, obj)
+        await policy_engine.reload()
+
+    @staticmethod
+    async def delete(*, pk: list[int]) -> int:
+        """
+        Delete policies
+
+        :param pk: Policy ID list
+        :return:
+        """
+        async with AsyncSessionLocal.begin() as db:
+            count = await policy_dao.delete(db, pk)
+        await policy_engine.reload()
+        return count
+
+
+policy_service: PolicyService = PolicyService()
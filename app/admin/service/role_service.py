@@ -15,9 +15,11 @@ from app.admin.schema.role import (
     UpdateRoleRuleParam,
 )
 from common.exception import errors
-from core.conf import settings
+from common.security.menu_cache import menu_tree_cache
+from common.security.policy import policy_engine
+from common.security.user_cache import user_cache
 from database.db import AsyncSessionLocal
-from database.redis import redis_client
+from database.replica import read_only
 
 
 class RoleService:
@@ -38,6 +40,7 @@ class RoleService:
             return role
 
     @staticmethod
+    @read_only
     async def get_all() -> Sequence[Role]:
         """Get all roles"""
         async with AsyncSessionLocal() as db:
@@ -45,6 +48,7 @@ class RoleService:
             return roles
 
     @staticmethod
+    @read_only
     async def get_by_user(*, pk: int) -> Sequence[Role]:
         """
         Get user's role list
@@ -99,11 +103,10 @@ class RoleService:
                 if role:
                     raise errors.ForbiddenError(msg="Role already exists")
             count = await role_dao.update(db, pk, obj)
-            for user in await role.awaitable_attrs.users:
-                await redis_client.delete_prefix(
-                    f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}"
-                )
-            return count
+        await user_cache.bump("role")
+        # Policies of disabled roles are not loaded
+        await policy_engine.reload()
+        return count
 
     @staticmethod
     async def update_role_menu(*, pk: int, menu_ids: UpdateRoleMenuParam) -> int:
@@ -118,16 +121,15 @@ class RoleService:
             role = await role_dao.get_with_relation(db, pk)
             if not role:
                 raise errors.NotFoundError(msg="Role does not exist")
-            for menu_id in menu_ids.menus:
-                menu = await menu_dao.get(db, menu_id)
-                if not menu:
-                    raise errors.NotFoundError(msg="Menu does not exist")
-            count = await role_dao.update_menus(db, pk, menu_ids)
-            for user in await role.awaitable_attrs.users:
-                await redis_client.delete_prefix(
-                    f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}"
+            menus = await menu_dao.get_many(db, menu_ids.menus)
+            if menus.missing:
+                raise errors.NotFoundError(
+                    msg=f"Menu does not exist: {', '.join(map(str, menus.missing))}"
                 )
-            return count
+            count = await role_dao.update_menus(db, pk, menu_ids)
+        await user_cache.bump("role")
+        await menu_tree_cache.bump()
+        return count
 
     @staticmethod
     async def update_role_rule(*, pk: int, rule_ids: UpdateRoleRuleParam) -> int:
@@ -142,14 +144,14 @@ class RoleService:
             role = await role_dao.get(db, pk)
             if not role:
                 raise errors.NotFoundError(msg="Role does not exist")
-            for rule_id in rule_ids.rules:
-                rule = await data_rule_dao.get(db, rule_id)
-                if not rule:
-                    raise errors.NotFoundError(msg="Data rule does not exist")
+            rules = await data_rule_dao.get_many(db, rule_ids.rules)
+            if rules.missing:
+                raise errors.NotFoundError(
+                    msg=f"Data rule does not exist: {', '.join(map(str, rules.missing))}"
+                )
             count = await role_dao.update_rules(db, pk, rule_ids)
-            for user in await role.awaitable_attrs.users:
-                await redis_client.delete(f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}")
-            return count
+        await user_cache.bump("role")
+        return count
 
     @staticmethod
     async def delete(*, pk: list[int]) -> int:
@@ -161,14 +163,9 @@ class RoleService:
         """
         async with AsyncSessionLocal.begin() as db:
             count = await role_dao.delete(db, pk)
-            for _pk in pk:
-                role = await role_dao.get(db, _pk)
-                if role:
-                    for user in await role.awaitable_attrs.users:
-                        await redis_client.delete(
-                            f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}"
-                        )
-            return count
+        await user_cache.bump("role")
+        await policy_engine.reload()
+        return count
 
 
 role_service: RoleService = RoleService()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from typing import Any
+
+from app.admin.crud.crud_user import user_dao
+from app.admin.schema.token import GetTokenDetail
+from common.dataclasses import TokenSession
+from common.enums import StatusType
+from common.pagination import get_page_params, paging_items
+from common.security.session import session_registry
+from core.conf import settings
+from database.db import AsyncSessionLocal
+from database.redis import redis_client
+from database.replica import read_only
+
+
+class TokenService:
+    """Token Service Class"""
+
+    @staticmethod
+    def get_detail(session: TokenSession, online_clients: set[str]) -> GetTokenDetail:
+        """
+        Get token details of a session
+
+        :param session: Session
+        :param online_clients: Online session UUIDs
+        :return:
+        """
+        extra_info = session.extra_info
+        return GetTokenDetail(
+            id=session.user_id,
+            session_uuid=session.session_uuid,
+            username=extra_info.get("username", "Unknown"),
+            nickname=extra_info.get("nickname", "Unknown"),
+            ip=extra_info.get("ip", "Unknown"),
+            os=extra_info.get("os", "Unknown"),
+            browser=extra_info.get("browser", "Unknown"),
+            device=extra_info.get("device", "Unknown"),
+            status=(
+                StatusType.enable
+                if session.session_uuid in online_clients
+                else StatusType.disable
+            ),
+            last_login_time=extra_info.get("last_login_time", "Unknown"),
+            expire_time=session.expire_time,
+        )
+
+    @read_only
+    async def get_tokens(self, *, username: str | None) -> dict[str, Any]:
+        """
+        Get a page of tokens
+
+        :param username: Username
+        :return:
+        """
+        params = get_page_params()
+        if username is not None:
+            async with AsyncSessionLocal() as db:
+                user = await user_dao.get_by_username(db, username)
+            sessions = await session_registry.get_user_sessions(user.id) if user else []
+            # Swagger tokens are not listed
+            sessions = [
+                session
+                for session in sessions
+                if session.extra_info.get("swagger") is None
+            ]
+            total = len(sessions)
+            sessions = sessions[params.offset : params.offset + params.limit]
+        else:
+            total, sessions = await session_registry.get_sessions(
+                params.offset, params.limit
+            )
+        online_clients = await redis_client.smembers(settings.TOKEN_ONLINE_REDIS_PREFIX)
+        data = [self.get_detail(session, online_clients) for session in sessions]
+        return paging_items(data, total)
+
+
+token_service: TokenService = TokenService()
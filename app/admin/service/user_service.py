@@ -12,6 +12,7 @@ from app.admin.model import User
 from app.admin.schema.user import (
     AddUserParam,
     AvatarParam,
+    GetUserInfoWithRelationDetail,
     RegisterUserParam,
     ResetPasswordParam,
     UpdateUserParam,
@@ -19,15 +20,16 @@ from app.admin.schema.user import (
 )
 from common.exception import errors
 from common.security.jwt import (
-    get_hash_password,
+    get_hash_password_async,
     get_token,
-    jwt_decode,
-    password_verify,
+    password_verify_async,
+    revoke_user_tokens,
     superuser_verify,
+    token_decode,
 )
-from core.conf import settings
+from common.security.user_cache import user_cache
 from database.db import AsyncSessionLocal
-from database.redis import redis_client
+from database.replica import read_only
 
 
 class UserService:
@@ -86,10 +88,11 @@ class UserService:
             dept = await dept_dao.get(db, obj.dept_id)
             if not dept:
                 raise errors.NotFoundError(msg="Department does not exist")
-            for role_id in obj.roles:
-                role = await role_dao.get(db, role_id)
-                if not role:
-                    raise errors.NotFoundError(msg="Role does not exist")
+            roles = await role_dao.get_many(db, obj.roles)
+            if roles.missing:
+                raise errors.NotFoundError(
+                    msg=f"Role does not exist: {', '.join(map(str, roles.missing))}"
+                )
             await user_dao.add(db, obj)
 
     @staticmethod
@@ -105,23 +108,19 @@ class UserService:
             user = await user_dao.get(db, request.user.id)
             if not user:
                 raise errors.NotFoundError(msg="User does not exist")
-            if not password_verify(obj.old_password, user.password):
+            if not await password_verify_async(obj.old_password, user.password):
                 raise errors.ForbiddenError(msg="Original password incorrect")
             if obj.new_password != obj.confirm_password:
                 raise errors.ForbiddenError(msg="Passwords do not match")
-            new_pwd = get_hash_password(obj.new_password, user.salt)
+            new_pwd = await get_hash_password_async(obj.new_password, user.salt)
             count = await user_dao.reset_password(db, request.user.id, new_pwd)
-            key_prefix = [
-                f"{settings.TOKEN_REDIS_PREFIX}:{request.user.id}",
-                f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{request.user.id}",
-                f"{settings.JWT_USER_REDIS_PREFIX}:{request.user.id}",
-            ]
-            for prefix in key_prefix:
-                await redis_client.delete_prefix(prefix)
-            return count
+            await revoke_user_tokens(request.user.id)
+        await user_cache.invalidate(request.user.id)
+        return count
 
     @staticmethod
-    async def get_userinfo(*, username: str) -> User:
+    @read_only
+    async def get_userinfo(*, username: str) -> GetUserInfoWithRelationDetail:
         """
         Get user information
 
@@ -129,7 +128,7 @@ class UserService:
         :return:
         """
         async with AsyncSessionLocal() as db:
-            user = await user_dao.get_with_relation(db, username=username)
+            user = await user_dao.get_relation_detail(db, username=username)
             if not user:
                 raise errors.NotFoundError(msg="User does not exist")
             return user
@@ -165,8 +164,8 @@ class UserService:
                 if email:
                     raise errors.ForbiddenError(msg="Email already registered")
             count = await user_dao.update_userinfo(db, user.id, obj)
-            await redis_client.delete(f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}")
-            return count
+        await user_cache.invalidate(user.id)
+        return count
 
     @staticmethod
     async def update_roles(
@@ -188,14 +187,13 @@ class UserService:
             input_user = await user_dao.get_with_relation(db, username=username)
             if not input_user:
                 raise errors.NotFoundError(msg="User does not exist")
-            for role_id in obj.roles:
-                role = await role_dao.get(db, role_id)
-                if not role:
-                    raise errors.NotFoundError(msg="Role does not exist")
+            roles = await role_dao.get_many(db, obj.roles)
+            if roles.missing:
+                raise errors.NotFoundError(
+                    msg=f"Role does not exist: {', '.join(map(str, roles.missing))}"
+                )
             await user_dao.update_role(db, input_user, obj)
-            await redis_client.delete(
-                f"{settings.JWT_USER_REDIS_PREFIX}:{input_user.id}"
-            )
+        await user_cache.invalidate(input_user.id)
 
     @staticmethod
     async def update_avatar(
@@ -216,8 +214,8 @@ class UserService:
             if not user:
                 raise errors.NotFoundError(msg="User does not exist")
             count = await user_dao.update_avatar(db, user.id, avatar)
-            await redis_client.delete(f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}")
-            return count
+        await user_cache.invalidate(user.id)
+        return count
 
     @staticmethod
     async def get_select(
@@ -254,8 +252,8 @@ class UserService:
                 raise errors.ForbiddenError(msg="Illegal operation")
             super_status = await user_dao.get_super(db, pk)
             count = await user_dao.set_super(db, pk, not super_status)
-            await redis_client.delete(f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}")
-            return count
+        await user_cache.invalidate(user.id)
+        return count
 
     @staticmethod
     async def update_staff(*, request: Request, pk: int) -> int:
@@ -275,8 +273,8 @@ class UserService:
                 raise errors.ForbiddenError(msg="Illegal operation")
             staff_status = await user_dao.get_staff(db, pk)
             count = await user_dao.set_staff(db, pk, not staff_status)
-            await redis_client.delete(f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}")
-            return count
+        await user_cache.invalidate(user.id)
+        return count
 
     @staticmethod
     async def update_status(*, request: Request, pk: int) -> int:
@@ -296,8 +294,8 @@ class UserService:
                 raise errors.ForbiddenError(msg="Illegal operation")
             status = await user_dao.get_status(db, pk)
             count = await user_dao.set_status(db, pk, 0 if status == 1 else 1)
-            await redis_client.delete(f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}")
-            return count
+        await user_cache.invalidate(user.id)
+        return count
 
     @staticmethod
     async def update_multi_login(*, request: Request, pk: int) -> int:
@@ -320,22 +318,20 @@ class UserService:
             )
             new_multi_login = not multi_login
             count = await user_dao.set_multi_login(db, pk, new_multi_login)
-            await redis_client.delete(f"{settings.JWT_USER_REDIS_PREFIX}:{user.id}")
-            token = get_token(request)
-            token_payload = jwt_decode(token)
-            if pk == user.id:
-                # System administrator modifies themselves, all tokens except current one are invalidated
-                if not new_multi_login:
-                    key_prefix = f"{settings.TOKEN_REDIS_PREFIX}:{user.id}"
-                    await redis_client.delete_prefix(
-                        key_prefix, exclude=f"{key_prefix}:{token_payload.session_uuid}"
-                    )
-            else:
-                # System administrator modifies others, all their tokens are invalidated
-                if not new_multi_login:
-                    key_prefix = f"{settings.TOKEN_REDIS_PREFIX}:{user.id}"
-                    await redis_client.delete_prefix(key_prefix)
-            return count
+        await user_cache.invalidate(user.id)
+        token = get_token(request)
+        token_payload = token_decode(token)
+        if pk == user.id:
+            # System administrator modifies themselves, all tokens except current one are invalidated
+            if not new_multi_login:
+                await revoke_user_tokens(
+                    user.id, exclude=token_payload.session_uuid, refresh=False
+                )
+        else:
+            # System administrator modifies others, all their tokens are invalidated
+            if not new_multi_login:
+                await revoke_user_tokens(user.id, refresh=False)
+        return count
 
     @staticmethod
     async def delete(*, username: str) -> int:
@@ -350,13 +346,9 @@ class UserService:
             if not user:
                 raise errors.NotFoundError(msg="User does not exist")
             count = await user_dao.delete(db, user.id)
-            key_prefix = [
-                f"{settings.TOKEN_REDIS_PREFIX}:{user.id}",
-                f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{user.id}",
-            ]
-            for key in key_prefix:
-                await redis_client.delete_prefix(key)
-            return count
+            await revoke_user_tokens(user.id)
+        await user_cache.invalidate(user.id)
+        return count
 
 
 user_service: UserService = UserService()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Count Redis round-trips of jwt_authentication
+
+Requires the configured Redis and database, run with::
+
+    python -m benchmarks.auth_round_trips --user-id 1 --requests 1000
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from redis.asyncio.client import Pipeline
+
+from common.security.jwt import create_access_token, jwt_authentication, revoke_token
+from common.security.user_cache import user_cache
+from database.redis import redis_client
+
+# Maximum round-trips of an authenticated request whose user is cached in Redis
+ROUND_TRIP_BUDGET = 1
+
+
+class RoundTripCounter:
+    """Count commands sent to Redis, a pipeline counts as a single round-trip"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self._execute_command = redis_client.execute_command
+        self._pipeline_execute = Pipeline.execute
+
+    def __enter__(self) -> "RoundTripCounter":
+        counter = self
+
+        async def execute_command(*args, **kwargs):
+            counter.count += 1
+            return await counter._execute_command(*args, **kwargs)
+
+        async def pipeline_execute(pipe, *args, **kwargs):
+            counter.count += 1
+            return await counter._pipeline_execute(pipe, *args, **kwargs)
+
+        redis_client.execute_command = execute_command
+        Pipeline.execute = pipeline_execute
+        return self
+
+    def __exit__(self, *exc) -> None:
+        del redis_client.execute_command
+        Pipeline.execute = self._pipeline_execute
+
+
+async def run(user_id: int, requests: int) -> int:
+    token = await create_access_token(str(user_id), multi_login=True)
+    try:
+        # Warm up the Redis user cache
+        await jwt_authentication(token.access_token)
+
+        results = {}
+        for name, local_cache in (("redis", False), ("local", True)):
+            with RoundTripCounter() as counter:
+                start = time.perf_counter()
+                for _ in range(requests):
+                    if not local_cache:
+                        user_cache.clear()
+                    await jwt_authentication(token.access_token)
+                elapsed = time.perf_counter() - start
+            results[name] = counter.count / requests
+            print(
+                f"{name:<6} round-trips/request: {results[name]:.2f} "
+                f"latency: {elapsed / requests * 1e6:.1f}us"
+            )
+    finally:
+        await revoke_token(str(user_id), token.session_uuid)
+        await redis_client.aclose()
+
+    if results["redis"] > ROUND_TRIP_BUDGET:
+        print(f"Regression: more than {ROUND_TRIP_BUDGET} round-trip(s) per request")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--requests", type=int, default=1000)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.user_id, args.requests)))
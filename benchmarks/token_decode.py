@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compare jwt_decode cost with and without the verified-token cache, run with::
+
+    python -m benchmarks.token_decode --number 100000
+"""
+import argparse
+import timeit
+from datetime import timedelta
+from uuid import uuid4
+
+from common.security.jwt import _token_payload_cache, jwt_decode, jwt_encode, jwt_verify
+from core.conf import settings
+from utils.timezone import timezone
+
+
+def run(number: int) -> None:
+    token = jwt_encode(
+        {
+            "session_uuid": str(uuid4()),
+            "exp": timezone.now() + timedelta(seconds=settings.TOKEN_EXPIRE_SECONDS),
+            "sub": "1",
+        }
+    )
+    _token_payload_cache.clear()
+    jwt_decode(token)
+
+    uncached = timeit.timeit(lambda: jwt_verify(token), number=number)
+    cached = timeit.timeit(lambda: jwt_decode(token), number=number)
+    print(f"uncached: {uncached / number * 1e6:.2f}us/decode")
+    print(f"cached:   {cached / number * 1e6:.2f}us/decode")
+    print(f"speedup:  {uncached / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+    run(args.number)
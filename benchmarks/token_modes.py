@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Compare issue and verify cost of JWT and opaque access tokens, run with::
+
+    python -m benchmarks.token_modes --number 100000
+
+Only the CPU work of each mode is measured: issuing encodes the token and computes the fingerprint
+stored in the session, verifying decodes the token and compares it with that fingerprint. The
+session round-trip to Redis is the same for both modes, see `benchmarks.auth_round_trips`
+"""
+import argparse
+import timeit
+from datetime import timedelta
+from uuid import uuid4
+
+from common.security.jwt import jwt_encode, jwt_verify, opaque_decode, opaque_encode
+from common.security.session import session_registry
+from core.conf import settings
+from utils.timezone import timezone
+
+
+def issue_jwt() -> tuple[str, str]:
+    token = jwt_encode(
+        {
+            "session_uuid": str(uuid4()),
+            "exp": timezone.now() + timedelta(seconds=settings.TOKEN_EXPIRE_SECONDS),
+            "sub": "1",
+        }
+    )
+    return token, session_registry.fingerprint(token)
+
+
+def issue_opaque() -> tuple[str, str]:
+    token = opaque_encode("1", str(uuid4()))
+    return token, session_registry.fingerprint(token)
+
+
+def verify_jwt(token: str, fingerprint: str) -> None:
+    # The verified-token cache is bypassed, it only helps repeated requests of one worker
+    jwt_verify(token)
+    assert session_registry.fingerprint(token) == fingerprint
+
+
+def verify_opaque(token: str, fingerprint: str) -> None:
+    opaque_decode(token)
+    assert session_registry.fingerprint(token) == fingerprint
+
+
+def run(number: int) -> None:
+    for mode, issue, verify in (
+        ("jwt", issue_jwt, verify_jwt),
+        ("opaque", issue_opaque, verify_opaque),
+    ):
+        token, fingerprint = issue()
+        issue_cost = timeit.timeit(issue, number=number) / number
+        verify_cost = (
+            timeit.timeit(lambda: verify(token, fingerprint), number=number) / number
+        )
+        print(
+            f"{mode:<7} issue: {issue_cost * 1e6:.2f}us  verify: {verify_cost * 1e6:.2f}us"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=100000)
+    args = parser.parse_args()
+    run(args.number)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Measure tree building over synthetic department and menu hierarchies, run with::
+
+    python -m benchmarks.tree_build --sizes 10000 100000 500000
+
+Department trees are deep, every node has a few children, menu trees are wide and three levels
+deep like directories, menus and buttons. Nodes are shuffled, as the builder does not rely on
+parents preceding their children, and a fresh copy is built on every run since building mutates
+the nodes
+"""
+import argparse
+import copy
+import random
+import time
+from typing import Any, Callable
+
+from utils.build_tree import recursive_to_tree, traversal_to_tree
+
+
+def dept_nodes(size: int, fanout: int = 4) -> list[dict[str, Any]]:
+    # Parent of node i is node (i - 2) // fanout + 1, a complete tree of the given fanout
+    return [
+        {
+            "id": i,
+            "parent_id": None if i == 1 else (i - 2) // fanout + 1,
+            "name": f"dept{i}",
+            "sort": i % 10,
+        }
+        for i in range(1, size + 1)
+    ]
+
+
+def menu_nodes(size: int) -> list[dict[str, Any]]:
+    directories = max(size // 100, 1)
+    menus = max(size // 10, 1)
+    nodes = []
+    for i in range(1, size + 1):
+        if i <= directories:
+            parent_id = None
+        elif i <= directories + menus:
+            parent_id = random.randint(1, directories)
+        else:
+            parent_id = random.randint(directories + 1, directories + menus)
+        nodes.append(
+            {"id": i, "parent_id": parent_id, "title": f"menu{i}", "sort": i % 10}
+        )
+    return nodes
+
+
+def measure(
+    build: Callable[[list[dict[str, Any]]], Any],
+    nodes: list[dict[str, Any]],
+    number: int,
+) -> float:
+    best = float("inf")
+    for _ in range(number):
+        copies = copy.deepcopy(nodes)
+        start = time.perf_counter()
+        build(copies)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes: list[int], number: int) -> None:
+    random.seed(0)
+    for shape, generate in (("dept", dept_nodes), ("menu", menu_nodes)):
+        for size in sizes:
+            nodes = generate(size)
+            random.shuffle(nodes)
+            for name, build in (
+                ("traversal", traversal_to_tree),
+                ("recursive", recursive_to_tree),
+            ):
+                cost = measure(build, nodes, number)
+                print(
+                    f"{shape:<5} {size:>7} {name:<9} {cost * 1e3:9.2f}ms"
+                    f"  {cost / size * 1e9:7.1f}ns/node"
+                )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10000, 50000, 100000, 500000]
+    )
+    parser.add_argument("--number", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.number)
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import dataclasses
+from typing import Any, Generic, Iterable, Sequence, TypeVar
+
+from sqlalchemy import (
+    ColumnElement,
+    Row,
+    Select,
+    Table,
+    and_,
+    delete,
+    exists,
+    func,
+    insert,
+    literal,
+    select,
+    true,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm.util import identity_key
+from sqlalchemy_crud_plus import CRUDPlus
+
+Model = TypeVar("Model")
+
+
+@dataclasses.dataclass
+class BatchLoad(Generic[Model]):
+    """Entities loaded by ID, in the order of the requested IDs"""
+
+    items: list[Model]
+    missing: list[int]
+
+
+async def load_by_ids(
+    db: AsyncSession, model: type[Model], pks: Iterable[int]
+) -> BatchLoad[Model]:
+    """
+    Load entities by ID in one query
+
+    Duplicate IDs are loaded once, and entities already in the session identity map are reused
+    without querying, so validating IDs in a service and then assigning them in a DAO costs a
+    single query
+
+    :param db: Database session
+    :param model: Model class
+    :param pks: ID list
+    :return:
+    """
+    pks = list(dict.fromkeys(pks))
+    loaded: dict[int, Model] = {}
+    pending = []
+    identity_map = db.sync_session.identity_map
+    for pk in pks:
+        obj = identity_map.get(identity_key(model, pk))
+        if obj is None:
+            pending.append(pk)
+        else:
+            loaded[pk] = obj
+    if pending:
+        result = await db.scalars(select(model).where(model.id.in_(pending)))
+        loaded.update((obj.id, obj) for obj in result)
+    return BatchLoad(
+        items=[loaded[pk] for pk in pks if pk in loaded],
+        missing=[pk for pk in pks if pk not in loaded],
+    )
+
+
+class CRUDBase(CRUDPlus[Model]):
+    """CRUD base with batch loading by ID"""
+
+    async def get_many(self, db: AsyncSession, pks: Iterable[int]) -> BatchLoad[Model]:
+        """
+        Load entities by ID in one query, reporting the missing IDs
+
+        :param db: Database session
+        :param pks: ID list
+        :return:
+        """
+        return await load_by_ids(db, self.model, pks)
+
+
+class CRUDTree(CRUDBase[Model]):
+    """
+    CRUD base of an adjacency list hierarchy indexed by a closure table
+
+    The closure table holds one row per (ancestor, descendant) pair, including each node paired
+    with itself at depth 0. Subclasses keep it in sync by calling `insert_closure` after creating
+    a node and `move_closure` after changing its parent, rows of deleted nodes are removed by the
+    foreign key cascade
+    """
+
+    def __init__(self, model: type[Model], closure: Table) -> None:
+        super().__init__(model)
+        self.closure = closure
+
+    def _filters(self, model: Any) -> list[ColumnElement[bool]]:
+        """
+        Filters of nodes returned by hierarchy queries
+
+        :param model: Model class or alias
+        :return:
+        """
+        return []
+
+    async def insert_closure(
+        self, db: AsyncSession, node_id: int, parent_id: int | None
+    ) -> None:
+        """
+        Index a new node under its parent
+
+        :param db: Database session
+        :param node_id: Node ID
+        :param parent_id: Parent node ID
+        :return:
+        """
+        t = self.closure
+        stmt = select(literal(node_id), literal(node_id), literal(0))
+        if parent_id is not None:
+            stmt = stmt.union_all(
+                select(t.c.ancestor_id, literal(node_id), t.c.depth + 1).where(
+                    t.c.descendant_id == parent_id
+                )
+            )
+        await db.execute(
+            insert(t).from_select(["ancestor_id", "descendant_id", "depth"], stmt)
+        )
+
+    async def move_closure(
+        self, db: AsyncSession, node_id: int, parent_id: int | None
+    ) -> None:
+        """
+        Move a subtree under a new parent, which must not be part of it, see `is_descendant`
+
+        :param db: Database session
+        :param node_id: Root node ID of the subtree
+        :param parent_id: New parent node ID
+        :return:
+        """
+        t = self.closure
+        subtree = select(t.c.descendant_id).where(t.c.ancestor_id == node_id)
+        # Detach the subtree from its former ancestors, links within the subtree are kept
+        await db.execute(
+            delete(t).where(
+                t.c.descendant_id.in_(subtree), t.c.ancestor_id.not_in(subtree)
+            )
+        )
+        if parent_id is None:
+            return
+        supertree = t.alias("supertree")
+        subtree_links = t.alias("subtree")
+        await db.execute(
+            insert(t).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                # Every ancestor of the new parent is linked to every node of the subtree
+                select(
+                    supertree.c.ancestor_id,
+                    subtree_links.c.descendant_id,
+                    supertree.c.depth + subtree_links.c.depth + 1,
+                )
+                .join(subtree_links, true())
+                .where(
+                    supertree.c.descendant_id == parent_id,
+                    subtree_links.c.ancestor_id == node_id,
+                ),
+            )
+        )
+
+    async def is_descendant(
+        self, db: AsyncSession, ancestor_id: int, node_id: int
+    ) -> bool:
+        """
+        Check whether a node is in the subtree of another, itself included
+
+        Moving a node under one of its descendants would create a cycle
+
+        :param db: Database session
+        :param ancestor_id: Ancestor node ID
+        :param node_id: Node ID
+        :return:
+        """
+        t = self.closure
+        return await db.scalar(
+            select(
+                exists().where(
+                    t.c.ancestor_id == ancestor_id, t.c.descendant_id == node_id
+                )
+            )
+        )
+
+    async def has_children(self, db: AsyncSession, node_id: int) -> bool:
+        """
+        Check whether a node has children
+
+        :param db: Database session
+        :param node_id: Node ID
+        :return:
+        """
+        t = self.closure
+        return await db.scalar(
+            select(
+                exists().where(
+                    t.c.ancestor_id == node_id,
+                    t.c.depth == 1,
+                    t.c.descendant_id == self.model.id,
+                    *self._filters(self.model),
+                )
+            )
+        )
+
+    def _has_children(self) -> ColumnElement[bool]:
+        """Get expression of whether a node has children, correlated to the selected node"""
+        child = aliased(self.model)
+        return (
+            exists()
+            .where(child.parent_id == self.model.id, *self._filters(child))
+            .label("has_children")
+        )
+
+    async def get_children_nodes(
+        self, db: AsyncSession, parent_id: int | None
+    ) -> Sequence[Row[tuple[Model, bool]]]:
+        """
+        Get children of a node, or the roots, with whether each of them has children
+
+        :param db: Database session
+        :param parent_id: Parent node ID, None for the roots
+        :return:
+        """
+        stmt = (
+            select(self.model, self._has_children())
+            .where(self.model.parent_id == parent_id, *self._filters(self.model))
+            .order_by(self.model.sort, self.model.id)
+        )
+        return (await db.execute(stmt)).all()
+
+    async def search(
+        self, db: AsyncSession, *conditions: ColumnElement[bool], limit: int
+    ) -> Sequence[Row[tuple[Model, bool, bool]]]:
+        """
+        Get nodes matching conditions along with all their ancestors, with whether each of them
+        matched and has children
+
+        :param db: Database session
+        :param conditions: Search conditions
+        :param limit: Maximum number of matching nodes
+        :return:
+        """
+        t = self.closure
+        matched = (
+            select(self.model.id)
+            .where(*conditions, *self._filters(self.model))
+            .order_by(self.model.sort, self.model.id)
+            .limit(limit)
+            .cte("matched")
+        )
+        stmt = (
+            select(
+                self.model,
+                self.model.id.in_(select(matched.c.id)).label("matched"),
+                self._has_children(),
+            )
+            .where(
+                self.model.id.in_(
+                    select(t.c.ancestor_id).where(
+                        t.c.descendant_id.in_(select(matched.c.id))
+                    )
+                ),
+                *self._filters(self.model),
+            )
+            .order_by(self.model.sort, self.model.id)
+        )
+        return (await db.execute(stmt)).all()
+
+    def subtree_ids(self, node_id: int) -> Select:
+        """
+        Get statement selecting the IDs of a subtree, the node itself included
+
+        Used as a subquery, e.g. `Model.dept_id.in_(dept_dao.subtree_ids(dept_id))`
+
+        :param node_id: Root node ID of the subtree
+        :return:
+        """
+        t = self.closure
+        return select(t.c.descendant_id).where(t.c.ancestor_id == node_id)
+
+    async def get_subtree(self, db: AsyncSession, node_id: int) -> Sequence[Model]:
+        """
+        Get a node and all its descendants, ordered by depth
+
+        :param db: Database session
+        :param node_id: Root node ID of the subtree
+        :return:
+        """
+        t = self.closure
+        stmt = (
+            select(self.model)
+            .join(t, t.c.descendant_id == self.model.id)
+            .where(t.c.ancestor_id == node_id, *self._filters(self.model))
+            .order_by(t.c.depth, self.model.sort, self.model.id)
+        )
+        return (await db.scalars(stmt)).all()
+
+    async def get_ancestors(self, db: AsyncSession, node_id: int) -> Sequence[Model]:
+        """
+        Get ancestors of a node, from the root down to its parent
+
+        :param db: Database session
+        :param node_id: Node ID
+        :return:
+        """
+        t = self.closure
+        stmt = (
+            select(self.model)
+            .join(t, t.c.ancestor_id == self.model.id)
+            .where(
+                t.c.descendant_id == node_id, t.c.depth > 0, *self._filters(self.model)
+            )
+            .order_by(t.c.depth.desc())
+        )
+        return (await db.scalars(stmt)).all()
+
+    async def get_depth(self, db: AsyncSession, node_id: int) -> int | None:
+        """
+        Get depth of a node, 0 for roots and None for unknown nodes
+
+        :param db: Database session
+        :param node_id: Node ID
+        :return:
+        """
+        t = self.closure
+        return await db.scalar(
+            select(func.max(t.c.depth)).where(t.c.descendant_id == node_id)
+        )
+
+    async def rebuild_closure(self, db: AsyncSession) -> None:
+        """
+        Rebuild the closure table from parent IDs
+
+        :param db: Database session
+        :return:
+        """
+        t = self.closure
+        tree = select(
+            self.model.id.label("ancestor_id"),
+            self.model.id.label("descendant_id"),
+            literal(0).label("depth"),
+        ).cte("tree", recursive=True)
+        child = aliased(self.model)
+        # Parent IDs forming a cycle would recurse forever, stop when back at the ancestor
+        tree = tree.union_all(
+            select(tree.c.ancestor_id, child.id, tree.c.depth + 1)
+            .join(child, child.parent_id == tree.c.descendant_id)
+            .where(child.id != tree.c.ancestor_id)
+        )
+        await db.execute(delete(t))
+        await db.execute(
+            insert(t).from_select(
+                ["ancestor_id", "descendant_id", "depth"],
+                select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth),
+            )
+        )
+
+    async def sync_closure(self, db: AsyncSession) -> bool:
+        """
+        Rebuild the closure table when its self and parent links differ from the nodes, e.g. after
+        nodes were imported or re-parented without the DAO
+
+        :param db: Database session
+        :return:
+        """
+        t = self.closure
+        node_count, link_count = (
+            await db.execute(
+                select(func.count(), func.count(self.model.parent_id)).select_from(
+                    self.model
+                )
+            )
+        ).one()
+        self_count, indexed_link_count, matched_link_count = (
+            await db.execute(
+                select(
+                    func.count().filter(t.c.depth == 0),
+                    func.count().filter(t.c.depth == 1),
+                    func.count(self.model.id).filter(t.c.depth == 1),
+                )
+                .select_from(t)
+                .outerjoin(
+                    self.model,
+                    and_(
+                        self.model.id == t.c.descendant_id,
+                        self.model.parent_id == t.c.ancestor_id,
+                    ),
+                )
+                .where(t.c.depth <= 1)
+            )
+        ).one()
+        if self_count == node_count and (
+            indexed_link_count == matched_link_count == link_count
+        ):
+            return False
+        await self.rebuild_closure(db)
+        return True
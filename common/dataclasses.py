@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 import dataclasses
 from datetime import datetime
+from typing import Any
 
 from fastapi import Response
 
@@ -57,7 +58,17 @@ class RefreshToken:
 class TokenPayload:
     id: int
     session_uuid: str
-    expire_time: datetime
+    # Opaque tokens carry no expiry, it is kept in the session
+    expire_time: int | None
+
+
+@dataclasses.dataclass
+class TokenSession:
+    user_id: int
+    session_uuid: str
+    fingerprint: str
+    expire_time: int
+    extra_info: dict[str, Any]
 
 
 @dataclasses.dataclass
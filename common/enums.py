@@ -123,3 +123,12 @@ class FileType(StrEnum):
 
     image = "image"
     video = "video"
+
+
+class PageCountType(StrEnum):
+    """Pagination total count strategy"""
+
+    exact = "exact"
+    cached = "cached"
+    estimate = "estimate"
+    has_next = "has_next"
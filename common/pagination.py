@@ -2,15 +2,28 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
+import base64
+import binascii
+import hashlib
+import json
+from datetime import datetime
 from math import ceil
 from typing import TYPE_CHECKING, Any, Generic, Sequence, TypeVar
 
 from fastapi import Depends, Query
-from fastapi_pagination import pagination_ctx
+from fastapi_pagination import pagination_ctx, resolve_params
+from fastapi_pagination.api import request
 from fastapi_pagination.bases import AbstractPage, AbstractParams, RawParams
-from fastapi_pagination.ext.sqlalchemy import apaginate
 from fastapi_pagination.links.bases import create_links
 from pydantic import BaseModel, Field
+from sqlalchemy import func, select, tuple_
+
+from common.enums import PageCountType
+from common.exception import errors
+from common.log import log
+from core.conf import settings
+from database.redis import redis_client
+from utils.serializers import serializer_registry
 
 if TYPE_CHECKING:
     from sqlalchemy import Select
@@ -52,6 +65,17 @@ class _PageDetails(BaseModel):
     size: int = Field(description="Items per page")
     total_pages: int = Field(description="Total pages")
     links: _Links = Field(description="Pagination links")
+    count_type: PageCountType = Field(
+        PageCountType.exact,
+        description="Total count strategy, totals are approximate with estimate and has_next",
+    )
+    has_next: bool = Field(False, description="Whether there is a next page")
+    next_cursor: str | None = Field(
+        None, description="Next page cursor, cursor mode only"
+    )
+    prev_cursor: str | None = Field(
+        None, description="Previous page cursor, cursor mode only"
+    )
 
 
 class _CustomPage(_PageDetails, AbstractPage[T], Generic[T]):
@@ -89,6 +113,56 @@ class _CustomPage(_PageDetails, AbstractPage[T], Generic[T]):
             size=size,
             total_pages=total_pages,
             links=links,  # type: ignore
+            has_next=page < total_pages,
+        )
+
+
+class _CursorPageParams(BaseModel, AbstractParams):
+    """Cursor pagination parameters"""
+
+    cursor: str | None = Query(None, description="Page cursor")
+    size: int = Query(20, gt=0, le=200, description="Items per page")
+
+    def to_raw_params(self) -> RawParams:
+        return RawParams(limit=self.size)
+
+
+class _CursorPage(_PageDetails, AbstractPage[T], Generic[T]):
+    """Cursor pagination class"""
+
+    __params_type__ = _CursorPageParams
+
+    @classmethod
+    def create(
+        cls,
+        items: list,
+        params: _CursorPageParams,
+        total: int = 0,
+        next_cursor: str | None = None,
+        prev_cursor: str | None = None,
+        **kwargs,
+    ) -> _CursorPage[T]:
+        size = params.size
+        links = _Links(
+            first=_cursor_link(None, size),
+            last=_cursor_link(encode_cursor("prev", None), size),
+            self=_cursor_link(params.cursor, size),
+            next=_cursor_link(next_cursor, size) if next_cursor else None,
+            prev=_cursor_link(prev_cursor, size) if prev_cursor else None,
+        )
+
+        return cls(
+            items=items,
+            total=total,
+            # Cursor pages are not numbered
+            page=0,
+            size=size,
+            total_pages=ceil(total / size),
+            links=links,
+            has_next=next_cursor is not None,
+            next_cursor=next_cursor,
+            prev_cursor=prev_cursor,
+            **kwargs,
         )
 
 
@@ -117,18 +191,263 @@ class PageData(_PageDetails, Generic[SchemaT]):
     items: Sequence[SchemaT]
 
 
-async def paging_data(db: AsyncSession, select: Select) -> dict[str, Any]:
+async def _count_exact(db: AsyncSession, stmt: Select) -> int:
+    """
+    Count rows of a query exactly
+
+    :param db: Database session
+    :param stmt: SQL query statement
+    :return:
+    """
+    count_stmt = select(func.count()).select_from(stmt.order_by(None).subquery())
+    return await db.scalar(count_stmt)
+
+
+async def _count_cached(db: AsyncSession, stmt: Select) -> int:
+    """
+    Count rows of a query exactly, cached by the hash of the compiled query and its parameters
+
+    :param db: Database session
+    :param stmt: SQL query statement
+    :return:
+    """
+    compiled = stmt.order_by(None).compile(dialect=db.get_bind().dialect)
+    digest = hashlib.blake2b(
+        f"{compiled}{sorted(compiled.params.items())!r}".encode(), digest_size=16
+    ).hexdigest()
+    key = f"{settings.PAGINATION_COUNT_REDIS_PREFIX}:{digest}"
+    total = await redis_client.get(key)
+    if total is not None:
+        return int(total)
+    total = await _count_exact(db, stmt)
+    await redis_client.setex(key, settings.PAGINATION_COUNT_CACHE_SECONDS, total)
+    return total
+
+
+async def _count_estimate(db: AsyncSession, stmt: Select) -> int:
+    """
+    Estimate rows of a query from the PostgreSQL planner, small estimates are counted exactly
+
+    :param db: Database session
+    :param stmt: SQL query statement
+    :return:
+    """
+    dialect = db.get_bind().dialect
+    if dialect.name != "postgresql":
+        return await _count_exact(db, stmt)
+    try:
+        sql = stmt.order_by(None).compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True}
+        )
+    except Exception as e:
+        # Parameters that cannot be rendered inline, e.g. of unknown types
+        log.warning(f"Pagination count estimate unavailable: {e}")
+        return await _count_exact(db, stmt)
+    # Executed as is, colons in rendered literals must not be parsed as bind parameters
+    connection = await db.connection()
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    total = int(plan[0]["Plan"]["Plan Rows"])
+    if total < settings.PAGINATION_COUNT_ESTIMATE_THRESHOLD:
+        return await _count_exact(db, stmt)
+    return total
+
+
+_COUNTERS = {
+    PageCountType.exact: _count_exact,
+    PageCountType.cached: _count_cached,
+    PageCountType.estimate: _count_estimate,
+}
+
+
+async def count_total(db: AsyncSession, stmt: Select, count_type: PageCountType) -> int:
+    """
+    Count rows of a query with a count strategy other than `has_next`
+
+    :param db: Database session
+    :param stmt: SQL query statement
+    :param count_type: Count strategy
+    :return:
+    """
+    return await _COUNTERS[count_type](db, stmt)
+
+
+async def paging_data(
+    db: AsyncSession, select: Select, count_type: PageCountType | None = None
+) -> dict[str, Any]:
     """
     Create pagination data based on SQLAlchemy
 
+    With `has_next`, one extra row is fetched instead of counting, and the total only covers the
+    pages up to the next one
+
     :param db: Database session
     :param select: SQL query statement
+    :param count_type: Count strategy, `PAGINATION_COUNT_TYPE` by default
     :return:
     """
-    paginated_data: _CustomPage = await apaginate(db, select)
-    page_data = paginated_data.model_dump()
+    count_type = PageCountType(count_type or settings.PAGINATION_COUNT_TYPE)
+    params: _CustomPageParams = resolve_params()
+    raw_params = params.to_raw_params()
+    limit = raw_params.limit
+    if count_type == PageCountType.has_next:
+        limit += 1
+    result = await db.scalars(select.limit(limit).offset(raw_params.offset))
+    items = list(result.unique().all())
+    if count_type == PageCountType.has_next:
+        total = raw_params.offset + len(items)
+        items = items[: raw_params.limit]
+    else:
+        total = await count_total(db, select, count_type)
+    items = serializer_registry.serialize_loaded_list(items)
+    page_data = _CustomPage.create(items, params, total=total).model_dump()
+    page_data.update(count_type=count_type)
     return page_data
 
 
+def get_page_params() -> RawParams:
+    """Get limit and offset of the current paginated request"""
+    return resolve_params().to_raw_params()
+
+
+def paging_items(items: list, total: int) -> dict[str, Any]:
+    """
+    Create pagination data from items already fetched for the current page
+
+    :param items: Current page data list
+    :param total: Total number of records
+    :return:
+    """
+    page_data = _CustomPage.create(items, resolve_params(), total=total)
+    return page_data.model_dump()
+
+
+def encode_cursor(direction: str, position: tuple[datetime, int] | None) -> str:
+    """
+    Encode page cursor
+
+    :param direction: `next` for rows after the position, `prev` for rows before it
+    :param position: Sort value and ID of the row the page starts after, None from either end
+    :return:
+    """
+    value = (
+        [direction, position[0].isoformat(), position[1]] if position else [direction]
+    )
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, tuple[datetime, int] | None]:
+    """
+    Decode page cursor
+
+    :param cursor: Page cursor
+    :return:
+    """
+    try:
+        value = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        # A direction, optionally followed by the sort value and ID of a row
+        if not isinstance(value, list) or len(value) not in (1, 3):
+            raise ValueError
+        direction = value[0]
+        position = (
+            (datetime.fromisoformat(value[1]), int(value[2]))
+            if len(value) > 1
+            else None
+        )
+    except (binascii.Error, ValueError, TypeError, IndexError):
+        raise errors.RequestError(msg="Invalid page cursor")
+    if direction not in ("next", "prev"):
+        raise errors.RequestError(msg="Invalid page cursor")
+    return direction, position
+
+
+def _cursor_link(cursor: str | None, size: int) -> str:
+    """
+    Get link of a cursor page
+
+    :param cursor: Page cursor, the first page if None
+    :param size: Items per page
+    :return:
+    """
+    url = request().url.remove_query_params("cursor").include_query_params(size=size)
+    if cursor is not None:
+        url = url.include_query_params(cursor=cursor)
+    return f"{url.path}?{url.query}"
+
+
+async def cursor_paging_data(
+    db: AsyncSession,
+    stmt: Select,
+    sort_column: str = "created_time",
+    count_type: PageCountType | None = None,
+) -> dict[str, Any]:
+    """
+    Create keyset pagination data based on SQLAlchemy, ordered by a sort column and ID descending
+
+    Pages are fetched by seeking past the (sort value, ID) of the last row seen, encoded into an
+    opaque cursor, so deep pages cost the same as the first one. The ordering of the statement is
+    replaced
+
+    :param db: Database session
+    :param stmt: SQL query statement of a single model
+    :param sort_column: Sort column name
+    :param count_type: Count strategy, `PAGINATION_COUNT_TYPE` by default, with `has_next` no
+        total is counted and it only covers the current page and the next row
+    :return:
+    """
+    count_type = PageCountType(count_type or settings.PAGINATION_COUNT_TYPE)
+    params: _CursorPageParams = resolve_params()
+    size = params.size
+    direction, position = (
+        decode_cursor(params.cursor) if params.cursor else ("next", None)
+    )
+
+    model = stmt.column_descriptions[0]["entity"]
+    column, pk = getattr(model, sort_column), model.id
+    page_stmt = stmt.order_by(None)
+    if direction == "next":
+        if position is not None:
+            page_stmt = page_stmt.where(tuple_(column, pk) < tuple_(*position))
+        page_stmt = page_stmt.order_by(column.desc(), pk.desc())
+    else:
+        if position is not None:
+            page_stmt = page_stmt.where(tuple_(column, pk) > tuple_(*position))
+        page_stmt = page_stmt.order_by(column.asc(), pk.asc())
+    items = list((await db.scalars(page_stmt.limit(size + 1))).all())
+    has_more = len(items) > size
+    items = items[:size]
+    if direction == "prev":
+        items.reverse()
+
+    next_cursor = prev_cursor = None
+    if items:
+        first = (getattr(items[0], sort_column), items[0].id)
+        last = (getattr(items[-1], sort_column), items[-1].id)
+        if has_more if direction == "next" else position is not None:
+            next_cursor = encode_cursor("next", last)
+        if has_more if direction == "prev" else position is not None:
+            prev_cursor = encode_cursor("prev", first)
+
+    if count_type == PageCountType.has_next:
+        total = len(items) + has_more
+    else:
+        total = await count_total(db, stmt, count_type)
+    items = serializer_registry.serialize_loaded_list(items)
+    page_data = _CursorPage.create(
+        items,
+        params,
+        total=total,
+        next_cursor=next_cursor,
+        prev_cursor=prev_cursor,
+        count_type=count_type,
+    )
+    return page_data.model_dump()
+
+
 # Pagination dependency injection
 DependsPagination = Depends(pagination_ctx(_CustomPage))
+
+# Cursor pagination dependency injection
+DependsCursorPagination = Depends(pagination_ctx(_CursorPage))
@@ -1,74 +1,92 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-import json
+import hashlib
+import secrets
+import time
 from datetime import timedelta
 from typing import Any
 from uuid import uuid4
 
+from cachetools import LRUCache
 from fastapi import Depends, Request
 from fastapi.security import HTTPBearer
 from fastapi.security.utils import get_authorization_scheme_param
 from jose import ExpiredSignatureError, JWTError, jwt
-from pwdlib import PasswordHash
-from pwdlib.hashers.bcrypt import BcryptHasher
-from pydantic_core import from_json
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.admin.model import User
 from app.admin.schema.user import GetUserInfoWithRelationDetail
 from common.dataclasses import AccessToken, NewToken, RefreshToken, TokenPayload
 from common.exception.errors import AuthorizationError, TokenError
+from common.security.password import (  # noqa: F401
+    get_hash_password,
+    get_hash_password_async,
+    password_verify,
+    password_verify_async,
+)
+from common.security.principal import Principal, build_principal
+from common.security.session import session_registry
+from common.security.user_cache import GENERATION_SCOPES, user_cache
 from core.conf import settings
 from database.db import AsyncSessionLocal
 from database.redis import redis_client
-from utils.serializers import select_as_dict
+from database.replica import use_primary
 from utils.timezone import timezone
 
 # JWT authorizes dependency injection
 DependsJwtAuth = Depends(HTTPBearer())
 
-password_hash = PasswordHash((BcryptHasher(),))
+# Verified token payloads, keyed by token digest
+_token_payload_cache: LRUCache[bytes, TokenPayload] = LRUCache(
+    maxsize=settings.TOKEN_DECODE_CACHE_MAXSIZE
+)
 
 
-def get_hash_password(password: str, salt: bytes | None) -> str:
+def jwt_encode(payload: dict[str, Any]) -> str:
     """
-    Encrypt password using hash algorithm
+    Generate JWT token
 
-    :param password: Password
-    :param salt: Salt value
+    :param payload: Payload
     :return:
     """
-    return password_hash.hash(password, salt=salt)
+    return jwt.encode(
+        payload,
+        settings.TOKEN_SECRET_KEY,
+        settings.TOKEN_ALGORITHM,
+    )
 
 
-def password_verify(plain_password: str, hashed_password: str) -> bool:
+def _token_digest(token: str) -> bytes:
     """
-    Password verification
+    Get token cache key
 
-    :param plain_password: Password to verify
-    :param hashed_password: Hashed password
+    :param token: JWT token
     :return:
     """
-    return password_hash.verify(plain_password, hashed_password)
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
 
 
-def jwt_encode(payload: dict[str, Any]) -> str:
+def jwt_decode(token: str) -> TokenPayload:
     """
-    Generate JWT token
+    Decode JWT token, verified payloads are cached until the token expires
 
-    :param payload: Payload
+    :param token: JWT token
     :return:
     """
-    return jwt.encode(
-        payload,
-        settings.TOKEN_SECRET_KEY,
-        settings.TOKEN_ALGORITHM,
-    )
+    digest = _token_digest(token)
+    token_payload = _token_payload_cache.get(digest)
+    if token_payload is not None:
+        if token_payload.expire_time > time.time():
+            return token_payload
+        _token_payload_cache.pop(digest, None)
+        raise TokenError(msg="Token has expired")
+    token_payload = jwt_verify(token)
+    _token_payload_cache[digest] = token_payload
+    return token_payload
 
 
-def jwt_decode(token: str) -> TokenPayload:
+def jwt_verify(token: str) -> TokenPayload:
     """
-    Decode JWT token
+    Verify JWT token signature and decode its payload, bypassing the cache
 
     :param token: JWT token
     :return:
@@ -91,6 +109,46 @@ def jwt_decode(token: str) -> TokenPayload:
     )
 
 
+def opaque_encode(user_id: str, session_uuid: str | None = None) -> str:
+    """
+    Generate opaque token, a random secret prefixed with the IDs used to look up its session
+
+    :param user_id: User ID
+    :param session_uuid: Session UUID, omitted for refresh tokens
+    :return:
+    """
+    secret = secrets.token_urlsafe(32)
+    if session_uuid is None:
+        return f"{user_id}.{secret}"
+    return f"{user_id}.{session_uuid}.{secret}"
+
+
+def opaque_decode(token: str) -> TokenPayload:
+    """
+    Decode opaque token, it is only verified against its session
+
+    :param token: Opaque token
+    :return:
+    """
+    user_id, _, rest = token.partition(".")
+    session_uuid, _, secret = rest.rpartition(".")
+    if not user_id.isdigit() or not secret:
+        raise TokenError(msg="Invalid token")
+    return TokenPayload(id=int(user_id), session_uuid=session_uuid, expire_time=None)
+
+
+def token_decode(token: str) -> TokenPayload:
+    """
+    Decode token according to the configured token mode
+
+    :param token: Token
+    :return:
+    """
+    if settings.TOKEN_MODE == "opaque":
+        return opaque_decode(token)
+    return jwt_decode(token)
+
+
 async def create_access_token(user_id: str, multi_login: bool, **kwargs) -> AccessToken:
     """
     Generate encrypted token
@@ -102,30 +160,30 @@ async def create_access_token(user_id: str, multi_login: bool, **kwargs) -> Acce
     """
     expire = timezone.now() + timedelta(seconds=settings.TOKEN_EXPIRE_SECONDS)
     session_uuid = str(uuid4())
-    access_token = jwt_encode(
-        {
-            "session_uuid": session_uuid,
-            "exp": expire,
-            "sub": user_id,
-        }
-    )
-
-    if not multi_login:
-        await redis_client.delete_prefix(f"{settings.TOKEN_REDIS_PREFIX}:{user_id}")
+    if settings.TOKEN_MODE == "opaque":
+        access_token = opaque_encode(user_id, session_uuid)
+    else:
+        access_token = jwt_encode(
+            {
+                "session_uuid": session_uuid,
+                "exp": expire,
+                "sub": user_id,
+            }
+        )
 
-    await redis_client.setex(
-        f"{settings.TOKEN_REDIS_PREFIX}:{user_id}:{session_uuid}",
-        settings.TOKEN_EXPIRE_SECONDS,
+    # Additional token information is stored with the session
+    await session_registry.create(
+        int(user_id),
+        session_uuid,
         access_token,
+        int(expire.timestamp()),
+        exclusive=not multi_login,
+        # Swagger tokens are not listed
+        listed=not kwargs.get("swagger"),
+        extra_info=kwargs,
     )
-
-    # Additional token information is stored separately
-    if kwargs:
-        await redis_client.setex(
-            f"{settings.TOKEN_EXTRA_INFO_REDIS_PREFIX}:{session_uuid}",
-            settings.TOKEN_EXPIRE_SECONDS,
-            json.dumps(kwargs, ensure_ascii=False),
-        )
+    if not multi_login:
+        await user_cache.revoke(int(user_id))
 
     return AccessToken(
         access_token=access_token,
@@ -143,16 +201,16 @@ async def create_refresh_token(user_id: str, multi_login: bool) -> RefreshToken:
     :return:
     """
     expire = timezone.now() + timedelta(seconds=settings.TOKEN_REFRESH_EXPIRE_SECONDS)
-    refresh_token = jwt_encode({"exp": expire, "sub": user_id})
-
-    if not multi_login:
-        key_prefix = f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{user_id}"
-        await redis_client.delete_prefix(key_prefix)
+    if settings.TOKEN_MODE == "opaque":
+        refresh_token = opaque_encode(user_id)
+    else:
+        refresh_token = jwt_encode({"exp": expire, "sub": user_id})
 
-    await redis_client.setex(
-        f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{user_id}:{refresh_token}",
-        settings.TOKEN_REFRESH_EXPIRE_SECONDS,
+    await session_registry.create_refresh(
+        int(user_id),
         refresh_token,
+        int(expire.timestamp()),
+        exclusive=not multi_login,
     )
     return RefreshToken(refresh_token=refresh_token, refresh_token_expire_time=expire)
 
@@ -169,10 +227,7 @@ async def create_new_token(
     :param kwargs: Additional token information
     :return:
     """
-    redis_refresh_token = await redis_client.get(
-        f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{user_id}:{refresh_token}"
-    )
-    if not redis_refresh_token or redis_refresh_token != refresh_token:
+    if not await session_registry.verify_refresh(int(user_id), refresh_token):
         raise TokenError(msg="Refresh Token has expired, please login again")
     new_access_token = await create_access_token(user_id, multi_login, **kwargs)
     return NewToken(
@@ -190,8 +245,39 @@ async def revoke_token(user_id: str, session_uuid: str) -> None:
     :param session_uuid: Session ID
     :return:
     """
-    token_key = f"{settings.TOKEN_REDIS_PREFIX}:{user_id}:{session_uuid}"
-    await redis_client.delete(token_key)
+    await session_registry.revoke(int(user_id), session_uuid)
+    evict_token_payload(session_uuid)
+    await user_cache.revoke(int(user_id), session_uuid)
+
+
+async def revoke_user_tokens(
+    user_id: int, *, exclude: str | None = None, refresh: bool = True
+) -> None:
+    """
+    Revoke all tokens of a user
+
+    :param user_id: User ID
+    :param exclude: Session UUID to keep
+    :param refresh: Whether to revoke refresh tokens as well
+    :return:
+    """
+    for session_uuid in await session_registry.revoke_all(user_id, exclude=exclude):
+        evict_token_payload(session_uuid)
+        await user_cache.revoke(user_id, session_uuid)
+    if refresh:
+        await session_registry.revoke_refresh(user_id)
+
+
+def evict_token_payload(session_uuid: str) -> None:
+    """
+    Evict cached token payloads of a session
+
+    :param session_uuid: Session UUID
+    :return:
+    """
+    for digest, token_payload in list(_token_payload_cache.items()):
+        if token_payload.session_uuid == session_uuid:
+            _token_payload_cache.pop(digest, None)
 
 
 def get_token(request: Request) -> str:
@@ -208,7 +294,7 @@ def get_token(request: Request) -> str:
     return token
 
 
-async def get_current_user(db: AsyncSession, pk: int) -> User:
+async def get_current_user(db: AsyncSession, pk: int) -> GetUserInfoWithRelationDetail:
     """
     Get current user
 
@@ -218,7 +304,7 @@ async def get_current_user(db: AsyncSession, pk: int) -> User:
     """
     from app.admin.crud.crud_user import user_dao
 
-    user = await user_dao.get_with_relation(db, user_id=pk)
+    user = await user_dao.get_relation_detail(db, user_id=pk)
     if not user:
         raise TokenError(msg="Invalid token")
     if not user.status:
@@ -243,6 +329,22 @@ async def get_current_user(db: AsyncSession, pk: int) -> User:
     return user
 
 
+async def load_principal(user_id: int) -> Principal:
+    """
+    Load principal of a user from the primary
+
+    Principals are reloaded right after user, role and menu changes and cached as current, so
+    they are never read from a replica that may not have replayed those changes yet
+
+    :param user_id: User ID
+    :return:
+    """
+    with use_primary():
+        async with AsyncSessionLocal() as db:
+            current_user = await get_current_user(db, user_id)
+            return build_principal(current_user)
+
+
 def superuser_verify(request: Request) -> bool:
     """
     Verify current user permissions
@@ -256,36 +358,35 @@ def superuser_verify(request: Request) -> bool:
     return superuser
 
 
-async def jwt_authentication(token: str) -> GetUserInfoWithRelationDetail:
+async def jwt_authentication(token: str) -> Principal:
     """
-    JWT authentication
+    Token authentication, in opaque mode user ID and expiry come from the session only
 
     :param token: JWT token
     :return:
     """
-    token_payload = jwt_decode(token)
+    token_payload = token_decode(token)
     user_id = token_payload.id
-    redis_token = await redis_client.get(
-        f"{settings.TOKEN_REDIS_PREFIX}:{user_id}:{token_payload.session_uuid}"
-    )
-    if not redis_token:
+    user = user_cache.get(user_id, token_payload.session_uuid, token)
+    if user:
+        return user
+
+    # Session, cached user and generation counters are fetched together, one round-trip per request
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hget(session_registry.session_key(user_id), token_payload.session_uuid)
+        pipe.get(user_cache.key(user_id))
+        pipe.hmget(settings.JWT_USER_GENERATION_REDIS_KEY, GENERATION_SCOPES)
+        session, cache_user, generation = await pipe.execute()
+    session = session_registry.parse(user_id, token_payload.session_uuid, session)
+    if not session:
         raise TokenError(msg="Token has expired")
 
-    if token != redis_token:
+    if session_registry.fingerprint(token) != session.fingerprint:
         raise TokenError(msg="Token is invalid")
 
-    cache_user = await redis_client.get(f"{settings.JWT_USER_REDIS_PREFIX}:{user_id}")
-    if not cache_user:
-        async with AsyncSessionLocal() as db:
-            current_user = await get_current_user(db, user_id)
-            user = GetUserInfoWithRelationDetail(**select_as_dict(current_user))
-            await redis_client.setex(
-                f"{settings.JWT_USER_REDIS_PREFIX}:{user_id}",
-                settings.JWT_USER_REDIS_EXPIRE_SECONDS,
-                user.model_dump_json(),
-            )
-    else:
-        user = GetUserInfoWithRelationDetail.model_validate(
-            from_json(cache_user, allow_partial=True)
-        )
+    generation = user_cache.parse_generation(generation)
+    user = await user_cache.resolve(user_id, generation, cache_user, load_principal)
+    user_cache.set(
+        user_id, token_payload.session_uuid, token, session.expire_time, user
+    )
     return user
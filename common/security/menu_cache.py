@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import Awaitable, Callable, Iterable
+
+from cachetools import LRUCache
+
+from core.conf import settings
+from database.redis import redis_client
+
+
+class MenuTreeCache:
+    """
+    Cache of rendered user menu trees, shared by users with the same role set
+
+    Trees are cached as encoded JSON responses, in Redis and in a process-local LRU, keyed by the
+    sorted role IDs and the current menu generation. Changing menus or role menus bumps the
+    generation instead of deleting entries, entries of older generations are never read again and
+    expire in Redis. A tree is loaded at most once per worker for concurrent requests of one key
+    """
+
+    def __init__(self, maxsize: int) -> None:
+        """
+        Initialize menu tree cache
+
+        :param maxsize: Maximum number of trees cached per worker
+        :return:
+        """
+        self._cache: LRUCache[str, tuple[int, bytes]] = LRUCache(maxsize=maxsize)
+        self._loading: dict[tuple[int, str], asyncio.Task[bytes]] = {}
+
+    @staticmethod
+    def role_key(is_superuser: bool, role_ids: Iterable[int]) -> str:
+        """
+        Get cache key of a role set, superusers see every menu whatever their roles
+
+        :param is_superuser: Whether the user is a superuser
+        :param role_ids: User role IDs
+        :return:
+        """
+        if is_superuser:
+            return "superuser"
+        return ",".join(map(str, sorted(role_ids)))
+
+    @staticmethod
+    def key(generation: int, role_key: str) -> str:
+        """
+        Get Redis cache key of a tree
+
+        :param generation: Menu generation
+        :param role_key: Role set key
+        :return:
+        """
+        return f"{settings.MENU_TREE_REDIS_PREFIX}:{generation}:{role_key}"
+
+    @staticmethod
+    async def generation() -> int:
+        """Get current menu generation"""
+        return int(await redis_client.get(settings.MENU_TREE_GENERATION_REDIS_KEY) or 0)
+
+    async def get(self, role_key: str, loader: Callable[[], Awaitable[bytes]]) -> bytes:
+        """
+        Get cached tree, loading it if missing
+
+        :param role_key: Role set key
+        :param loader: Renders the tree of the role set, from the role set alone since the tree is
+            shared by every user of the role set
+        :return:
+        """
+        generation = await self.generation()
+        entry = self._cache.get(role_key)
+        if entry is not None and entry[0] == generation:
+            return entry[1]
+        key = (generation, role_key)
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(generation, role_key, loader))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        # A cancelled caller must not cancel the load other callers are waiting for
+        content = await asyncio.shield(task)
+        self._cache[role_key] = (generation, content)
+        return content
+
+    async def _load(
+        self, generation: int, role_key: str, loader: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """
+        Get tree from Redis, or render it and cache it in Redis
+
+        Trees rendered while the generation is bumped are cached under the older generation, so
+        they are never served as current
+
+        :param generation: Menu generation read before rendering
+        :param role_key: Role set key
+        :param loader: Renders the tree of the role set
+        :return:
+        """
+        value = await redis_client.get(self.key(generation, role_key))
+        if value is not None:
+            return value.encode()
+        content = await loader()
+        await redis_client.setex(
+            self.key(generation, role_key),
+            settings.MENU_TREE_REDIS_EXPIRE_SECONDS,
+            content.decode(),
+        )
+        return content
+
+    @staticmethod
+    async def bump() -> None:
+        """Bump menu generation, cached trees of every role set become stale in every worker"""
+        await redis_client.incr(settings.MENU_TREE_GENERATION_REDIS_KEY)
+
+
+menu_tree_cache: MenuTreeCache = MenuTreeCache(
+    maxsize=settings.MENU_TREE_LOCAL_CACHE_MAXSIZE
+)
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from pwdlib import PasswordHash
+from pwdlib.hashers.bcrypt import BcryptHasher
+
+from core.conf import settings
+
+T = TypeVar("T")
+
+password_hash = PasswordHash((BcryptHasher(),))
+
+
+def get_hash_password(password: str, salt: bytes | None) -> str:
+    """
+    Encrypt password using hash algorithm
+
+    :param password: Password
+    :param salt: Salt value
+    :return:
+    """
+    return password_hash.hash(password, salt=salt)
+
+
+def password_verify(plain_password: str, hashed_password: str) -> bool:
+    """
+    Password verification
+
+    :param plain_password: Password to verify
+    :param hashed_password: Hashed password
+    :return:
+    """
+    return password_hash.verify(plain_password, hashed_password)
+
+
+class PasswordHashExecutor:
+    """
+    Bounded executor for password hashing
+
+    bcrypt is CPU bound and takes tens of milliseconds, running it on the event loop stalls every
+    other coroutine of the worker. Calls are offloaded to a thread or process pool, at most
+    `max_concurrency` of them are submitted at once and the rest wait on the event loop
+    """
+
+    def __init__(
+        self, executor_type: str, max_workers: int, max_concurrency: int
+    ) -> None:
+        """
+        Initialize password hash executor
+
+        :param executor_type: Executor type, thread or process
+        :param max_workers: Maximum number of pool workers
+        :param max_concurrency: Maximum number of hashing calls submitted to the pool
+        :return:
+        """
+        if executor_type not in ("thread", "process"):
+            raise ValueError(f"Invalid password hash executor type: {executor_type}")
+        self.executor_type = executor_type
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor: Executor | None = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._waiting = 0
+        self._running = 0
+
+    @property
+    def executor(self) -> Executor:
+        """Lazily created pool, so that importing this module does not spawn workers"""
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="password_hash"
+                )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args: Any) -> T:
+        """
+        Run hashing function in the pool
+
+        :param func: Module level hashing function
+        :param args: Function arguments
+        :return:
+        """
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+
+    def stats(self) -> dict[str, Any]:
+        """Get executor statistics"""
+        return {
+            "executor": self.executor_type,
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "running": self._running,
+            "queue_depth": self._waiting,
+        }
+
+    def shutdown(self) -> None:
+        """Shut down the pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hash_executor: PasswordHashExecutor = PasswordHashExecutor(
+    executor_type=settings.PASSWORD_HASH_EXECUTOR,
+    max_workers=settings.PASSWORD_HASH_MAX_WORKERS,
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY,
+)
+
+
+async def get_hash_password_async(password: str, salt: bytes | None) -> str:
+    """
+    Encrypt password using hash algorithm without blocking the event loop
+
+    :param password: Password
+    :param salt: Salt value
+    :return:
+    """
+    return await password_hash_executor.run(get_hash_password, password, salt)
+
+
+async def password_verify_async(plain_password: str, hashed_password: str) -> bool:
+    """
+    Password verification without blocking the event loop
+
+    :param plain_password: Password to verify
+    :param hashed_password: Hashed password
+    :return:
+    """
+    return await password_hash_executor.run(
+        password_verify, plain_password, hashed_password
+    )
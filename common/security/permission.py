@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-from typing import TYPE_CHECKING
+from functools import lru_cache
+from typing import Any, Callable
 
 from fastapi import Request
 from sqlalchemy import ColumnElement, and_, or_
@@ -8,12 +9,10 @@ from sqlalchemy import ColumnElement, and_, or_
 from common.enums import RoleDataRuleExpressionType, RoleDataRuleOperatorType
 from common.exception import errors
 from common.exception.errors import ServerError
+from common.security.principal import PrincipalRule
 from core.conf import settings
 from utils.import_parse import dynamic_import_data_model
 
-if TYPE_CHECKING:
-    from app.admin.schema.data_rule import GetDataRuleDetail
-
 
 class RequestPermission:
     """
@@ -48,82 +47,73 @@ class RequestPermission:
             request.state.permission = self.value
 
 
-def filter_data_permission(request: Request) -> ColumnElement[bool]:
+# Condition factory of each rule expression, taking the model column and the rule value
+_RULE_CONDITIONS: dict[int, Callable[[Any, str], ColumnElement[bool]]] = {
+    RoleDataRuleExpressionType.eq: lambda column, value: column == value,
+    RoleDataRuleExpressionType.ne: lambda column, value: column != value,
+    RoleDataRuleExpressionType.gt: lambda column, value: column > value,
+    RoleDataRuleExpressionType.ge: lambda column, value: column >= value,
+    RoleDataRuleExpressionType.lt: lambda column, value: column < value,
+    RoleDataRuleExpressionType.le: lambda column, value: column <= value,
+    RoleDataRuleExpressionType.in_: lambda column, value: column.in_(value.split(",")),
+    RoleDataRuleExpressionType.not_in: lambda column, value: ~column.in_(
+        value.split(",")
+    ),
+}
+
+
+def get_data_rule_column(model: str, column: str) -> Any:
     """
-    Filter data permissions, control user visible data scope
+    Get model column of a data rule, validating that both are available for data rules
 
-    Use cases:
-        - After user logs in to the frontend, control what data they can see
-        - Filter data access permissions based on user roles and rules
+    :param model: Rule model name
+    :param column: Rule column name
+    :return:
+    """
+    if model not in settings.DATA_PERMISSION_MODELS:
+        raise errors.NotFoundError(msg="Data rule model does not exist")
+    model_ins = dynamic_import_data_model(settings.DATA_PERMISSION_MODELS[model])
+    if (
+        column in settings.DATA_PERMISSION_COLUMN_EXCLUDE
+        or column not in model_ins.__table__.columns.keys()
+    ):
+        raise errors.NotFoundError(msg="Data rule model column does not exist")
+    return getattr(model_ins, column)
+
+
+@lru_cache(maxsize=1024)
+def compile_data_rule(rule: PrincipalRule) -> ColumnElement[bool] | None:
+    """
+    Compile data rule into its filter condition, SQLAlchemy conditions are immutable and reused
 
-    :param request: FastAPI request object
+    :param rule: Data rule
     :return:
     """
-    # Get user roles and rules
-    data_rules = []
-    for role in request.user.roles:
-        data_rules.extend(role.rules)
-    user_data_rules: list[GetDataRuleDetail] = list(dict.fromkeys(data_rules))
+    condition = _RULE_CONDITIONS.get(rule.expression)
+    if condition is None:
+        return None
+    return condition(get_data_rule_column(rule.model, rule.column), rule.value)
 
-    # Super admins and users without rules are not filtered
-    if request.user.is_superuser or not user_data_rules:
-        return or_(1 == 1)
 
+@lru_cache(maxsize=1024)
+def compile_data_rules(rules: tuple[PrincipalRule, ...]) -> ColumnElement[bool]:
+    """
+    Combine compiled data rules into one filter condition, cached per rule set
+
+    :param rules: Data rules ordered by ID
+    :return:
+    """
     where_and_list = []
     where_or_list = []
-
-    for rule in user_data_rules:
-        # Verify rule model
-        rule_model = rule.model
-        if rule_model not in settings.DATA_PERMISSION_MODELS:
-            raise errors.NotFoundError(msg="Data rule model does not exist")
-        model_ins = dynamic_import_data_model(
-            settings.DATA_PERMISSION_MODELS[rule_model]
-        )
-
-        # Verify rule column
-        model_columns = [
-            key
-            for key in model_ins.__table__.columns.keys()
-            if key not in settings.DATA_PERMISSION_COLUMN_EXCLUDE
-        ]
-        column = rule.column
-        if column not in model_columns:
-            raise errors.NotFoundError(msg="Data rule model column does not exist")
-
-        # Build filter conditions
-        column_obj = getattr(model_ins, column)
-        rule_expression = rule.expression
-        condition = None
-        if rule_expression == RoleDataRuleExpressionType.eq:
-            condition = column_obj == rule.value
-        elif rule_expression == RoleDataRuleExpressionType.ne:
-            condition = column_obj != rule.value
-        elif rule_expression == RoleDataRuleExpressionType.gt:
-            condition = column_obj > rule.value
-        elif rule_expression == RoleDataRuleExpressionType.ge:
-            condition = column_obj >= rule.value
-        elif rule_expression == RoleDataRuleExpressionType.lt:
-            condition = column_obj < rule.value
-        elif rule_expression == RoleDataRuleExpressionType.le:
-            condition = column_obj <= rule.value
-        elif rule_expression == RoleDataRuleExpressionType.in_:
-            values = (
-                rule.value.split(",") if isinstance(rule.value, str) else rule.value
-            )
-            condition = column_obj.in_(values)
-        elif rule.expression == RoleDataRuleExpressionType.not_in:
-            values = (
-                rule.value.split(",") if isinstance(rule.value, str) else rule.value
-            )
-            condition = ~column_obj.in_(values)
-
+    for rule in rules:
+        condition = compile_data_rule(rule)
+        if condition is None:
+            continue
         # Add to corresponding list based on operator
-        if condition is not None:
-            if rule.operator == RoleDataRuleOperatorType.AND:
-                where_and_list.append(condition)
-            elif rule.operator == RoleDataRuleOperatorType.OR:
-                where_or_list.append(condition)
+        if rule.operator == RoleDataRuleOperatorType.AND:
+            where_and_list.append(condition)
+        elif rule.operator == RoleDataRuleOperatorType.OR:
+            where_or_list.append(condition)
 
     # Combine all conditions
     where_list = []
@@ -133,3 +123,25 @@ def filter_data_permission(request: Request) -> ColumnElement[bool]:
         where_list.append(or_(*where_or_list))
 
     return or_(*where_list) if where_list else or_(1 == 1)
+
+
+def filter_data_permission(request: Request) -> ColumnElement[bool]:
+    """
+    Filter data permissions, control user visible data scope
+
+    Use cases:
+        - After user logs in to the frontend, control what data they can see
+        - Filter data access permissions based on user roles and rules
+
+    :param request: FastAPI request object
+    :return:
+    """
+    # User rules, deduplicated across roles and ordered by ID
+    user_data_rules: tuple[PrincipalRule, ...] = request.user.rules
+
+    # Super admins and users without rules are not filtered
+    if request.user.is_superuser or not user_data_rules:
+        return or_(1 == 1)
+
+    # Rules are part of the cache key, so edited rules are compiled again
+    return compile_data_rules(user_data_rules)
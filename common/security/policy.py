@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+from typing import Iterable
+
+from cachetools import LRUCache
+from fastapi import Request
+
+from common.log import log
+from core.conf import settings
+from database.redis import redis_client
+
+# Policy path segment matching exactly one segment
+_ANY_SEGMENT = "*"
+# Policy path segment matching all remaining segments, only allowed last
+_ANY_SEGMENTS = "**"
+# Policy method matching any method
+_ANY_METHOD = "*"
+
+
+class _PolicyNode:
+    """Policy trie node, one per path segment"""
+
+    __slots__ = ("children", "role_ids")
+
+    def __init__(self) -> None:
+        self.children: dict[str, _PolicyNode] = {}
+        self.role_ids: set[int] = set()
+
+
+class PolicyEngine:
+    """
+    In-process RBAC policy engine
+
+    Role policies are compiled into one trie per request method, over the segments of the route
+    path templates registered by FastAPI, e.g. `/api/v1/sys/users/{username}`. Requests are
+    matched by their route template rather than their path, so the set of roles allowed for a
+    route is resolved once and then served from memory. Policies are loaded from the database at
+    startup and reloaded in every worker when a reload is published
+    """
+
+    def __init__(self) -> None:
+        self._roots: dict[str, _PolicyNode] = {}
+        self._role_ids: LRUCache[tuple[str, str], frozenset[int]] = LRUCache(
+            maxsize=4096
+        )
+
+    @staticmethod
+    def split(path: str) -> list[str]:
+        """
+        Split path into segments
+
+        :param path: Path
+        :return:
+        """
+        return [segment for segment in path.split("/") if segment]
+
+    def compile(self, policies: Iterable[tuple[int, str, str]]) -> None:
+        """
+        Compile policies, replacing the current ones
+
+        :param policies: (role ID, path, method) list
+        :return:
+        """
+        roots: dict[str, _PolicyNode] = {}
+        for role_id, path, method in policies:
+            node = roots.setdefault(method.upper(), _PolicyNode())
+            for segment in self.split(path):
+                node = node.children.setdefault(segment, _PolicyNode())
+            node.role_ids.add(role_id)
+        self._roots = roots
+        self._role_ids.clear()
+
+    def _match(
+        self, node: _PolicyNode, segments: list[str], index: int, role_ids: set[int]
+    ) -> None:
+        """
+        Collect roles of all policies matching the remaining segments
+
+        :param node: Current node
+        :param segments: Path segments
+        :param index: Index of the next segment
+        :param role_ids: Matched role IDs
+        :return:
+        """
+        rest = node.children.get(_ANY_SEGMENTS)
+        if rest is not None:
+            role_ids.update(rest.role_ids)
+        if index == len(segments):
+            role_ids.update(node.role_ids)
+            return
+        for key in (segments[index], _ANY_SEGMENT):
+            child = node.children.get(key)
+            if child is not None:
+                self._match(child, segments, index + 1, role_ids)
+
+    def get_role_ids(self, method: str, path: str) -> frozenset[int]:
+        """
+        Get roles allowed to request a route
+
+        :param method: Request method
+        :param path: Route path template
+        :return:
+        """
+        key = (method, path)
+        role_ids = self._role_ids.get(key)
+        if role_ids is None:
+            matched: set[int] = set()
+            segments = self.split(path)
+            for root_method in (method, _ANY_METHOD):
+                root = self._roots.get(root_method)
+                if root is not None:
+                    self._match(root, segments, 0, matched)
+            role_ids = self._role_ids[key] = frozenset(matched)
+        return role_ids
+
+    def enforce(self, role_ids: frozenset[int], method: str, path: str) -> bool:
+        """
+        Check whether any of the roles is allowed to request a route
+
+        :param role_ids: User role IDs
+        :param method: Request method
+        :param path: Route path template
+        :return:
+        """
+        return not role_ids.isdisjoint(self.get_role_ids(method, path))
+
+    async def load(self) -> None:
+        """Load policies of enabled roles from the database"""
+        from app.admin.crud.crud_policy import policy_dao
+        from database.db import AsyncSessionLocal
+
+        async with AsyncSessionLocal() as db:
+            policies = await policy_dao.get_enabled(db)
+        self.compile(policies)
+        log.info(f"RBAC policies loaded: {len(policies)}")
+
+    @staticmethod
+    async def reload() -> None:
+        """Publish policy reload to all workers, including this one"""
+        await redis_client.publish(settings.RBAC_POLICY_RELOAD_CHANNEL, "reload")
+
+    async def listen(self) -> None:
+        """Load policies and reload them when published, reconnecting until cancelled"""
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.RBAC_POLICY_RELOAD_CHANNEL)
+                # Reloads may have been missed while not subscribed
+                await self.load()
+                async for _ in pubsub.listen():
+                    await self.load()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"RBAC policy reload subscriber exception: {e}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+def get_route_template(request: Request) -> str:
+    """
+    Get full path template of the route a request matched, e.g. `/api/v1/sys/users/{username}`
+
+    Depending on the FastAPI version, the matched route holds either its full template or the one
+    relative to its router. The relative template always matches the last segments of the path,
+    so the path segments before them, which are router prefixes, are prepended to it
+
+    :param request: FastAPI request object
+    :return:
+    """
+    path = request.scope["path"]
+    root_path = request.scope.get("root_path", "")
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path) :]
+    route = request.scope.get("route")
+    if route is None:
+        return path
+    segments = PolicyEngine.split(path)
+    template = PolicyEngine.split(route.path_format)
+    prefix = segments[: len(segments) - len(template)]
+    return "/" + "/".join(prefix + template)
+
+
+policy_engine: PolicyEngine = PolicyEngine()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from typing import Any
+
+import msgspec
+
+from app.admin.model import User
+from app.admin.schema.user import GetUserInfoWithRelationDetail
+from common.enums import StatusType
+
+
+class PrincipalRule(msgspec.Struct, frozen=True):
+    """Data rule of an authenticated user, only the columns used to filter data"""
+
+    id: int
+    model: str
+    column: str
+    operator: int
+    expression: int
+    value: str
+
+
+class Principal(msgspec.Struct, kw_only=True):
+    """
+    Authenticated user attached to `request.user`
+
+    Relations are flattened into ids, and the permission identifiers of all enabled menus are
+    precomputed into a set, so permission checks are O(1) membership tests. Encoded with msgspec
+    it is an order of magnitude smaller and faster to decode than the user with its relations
+    """
+
+    id: int
+    uuid: str
+    username: str
+    nickname: str
+    email: str | None = None
+    phone: str | None = None
+    avatar: str | None = None
+    status: int = StatusType.enable
+    is_superuser: bool = False
+    is_staff: bool = False
+    is_multi_login: bool = False
+    join_time: datetime
+    last_login_time: datetime | None = None
+    dept_id: int | None = None
+    dept_name: str | None = None
+    role_ids: frozenset[int] = frozenset()
+    role_names: list[str] = []
+    menu_ids: frozenset[int] = frozenset()
+    perms: frozenset[str] = frozenset()
+    # Ordered by ID
+    rules: tuple[PrincipalRule, ...] = ()
+
+    @property
+    def rule_ids(self) -> frozenset[int]:
+        """Data rule ID set"""
+        return frozenset(rule.id for rule in self.rules)
+
+    def has_perm(self, perm: str) -> bool:
+        """
+        Check whether the user is granted a menu permission identifier
+
+        :param perm: Permission identifier
+        :return:
+        """
+        return perm in self.perms
+
+    def get_current_info(self) -> dict[str, Any]:
+        """Get current user information, with department and role names"""
+        return {
+            "id": self.id,
+            "uuid": self.uuid,
+            "username": self.username,
+            "nickname": self.nickname,
+            "email": self.email,
+            "phone": self.phone,
+            "avatar": self.avatar,
+            "status": self.status,
+            "is_superuser": self.is_superuser,
+            "is_staff": self.is_staff,
+            "is_multi_login": self.is_multi_login,
+            "join_time": self.join_time,
+            "last_login_time": self.last_login_time,
+            "dept_id": self.dept_id,
+            "dept": self.dept_name,
+            "roles": self.role_names,
+        }
+
+
+def build_principal(user: User | GetUserInfoWithRelationDetail) -> Principal:
+    """
+    Build principal from a user loaded with its department, roles, menus and data rules
+
+    :param user: User
+    :return:
+    """
+    menu_ids = set()
+    perms = set()
+    rules = {}
+    for role in user.roles:
+        for menu in role.menus:
+            menu_ids.add(menu.id)
+            if menu.perms and menu.status == StatusType.enable:
+                perms.update(menu.perms.split(","))
+        for rule in role.rules:
+            rules[rule.id] = PrincipalRule(
+                id=rule.id,
+                model=rule.model,
+                column=rule.column,
+                operator=rule.operator,
+                expression=rule.expression,
+                value=rule.value,
+            )
+    return Principal(
+        id=user.id,
+        uuid=user.uuid,
+        username=user.username,
+        nickname=user.nickname,
+        email=user.email,
+        phone=user.phone,
+        avatar=user.avatar,
+        status=user.status,
+        is_superuser=user.is_superuser,
+        is_staff=user.is_staff,
+        is_multi_login=user.is_multi_login,
+        join_time=user.join_time,
+        last_login_time=user.last_login_time,
+        dept_id=user.dept_id,
+        dept_name=user.dept.name if user.dept else None,
+        role_ids=frozenset(role.id for role in user.roles),
+        role_names=[role.name for role in user.roles],
+        menu_ids=frozenset(menu_ids),
+        perms=frozenset(perms),
+        rules=tuple(rules[rule_id] for rule_id in sorted(rules)),
+    )
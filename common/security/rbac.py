@@ -2,13 +2,11 @@
 # -*- coding: utf-8 -*-
 from fastapi import Depends, Request
 
-from common.enums import MethodType, StatusType
-from common.exception import errors
+from common.enums import MethodType
 from common.exception.errors import AuthorizationError, TokenError
-from common.log import log
 from common.security.jwt import DependsJwtAuth
+from common.security.policy import get_route_template, policy_engine
 from core.conf import settings
-from utils.import_parse import import_module_cached
 
 
 async def rbac_verify(request: Request, _token: str = DependsJwtAuth) -> None:
@@ -34,14 +32,13 @@ async def rbac_verify(request: Request, _token: str = DependsJwtAuth) -> None:
         return
 
     # Check user roles
-    user_roles = request.user.roles
-    if not user_roles or all(status == 0 for status in user_roles):
+    if not request.user.role_ids:
         raise AuthorizationError(
             msg="User has no assigned roles, please contact system administrator"
         )
 
     # Check user role menus
-    if not any(len(role.menus) > 0 for role in user_roles):
+    if not request.user.menu_ids:
         raise AuthorizationError(
             msg="User has no assigned menus, please contact system administrator"
         )
@@ -67,26 +64,13 @@ async def rbac_verify(request: Request, _token: str = DependsJwtAuth) -> None:
             return
 
         # Assigned menu permission verification
-        allow_perms = []
-        for role in user_roles:
-            for menu in role.menus:
-                if menu.perms and menu.status == StatusType.enable:
-                    allow_perms.extend(menu.perms.split(","))
-        if path_auth_perm not in allow_perms:
+        if not request.user.has_perm(path_auth_perm):
             raise AuthorizationError
     else:
-        try:
-            casbin_rbac = import_module_cached("plugin.casbin.utils.rbac")
-            casbin_verify = getattr(casbin_rbac, "casbin_verify")
-        except (ImportError, AttributeError) as e:
-            log.error(
-                f"Attempting to perform RBAC permission verification through casbin, but this plugin does not exist: {e}"
-            )
-            raise errors.ServerError(
-                msg="Permission verification failed, please contact system administrator"
-            )
-
-        await casbin_verify(request)
+        # Route template of the request, policies are defined on templates rather than paths
+        path_format = get_route_template(request)
+        if not policy_engine.enforce(request.user.role_ids, method, path_format):
+            raise AuthorizationError
 
 
 # RBAC authorization dependency injection
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import hashlib
+import json
+import time
+from typing import Any
+
+from common.dataclasses import TokenSession
+from core.conf import settings
+from database.redis import redis_client
+
+
+class SessionRegistry:
+    """
+    Registry of user sessions
+
+    Sessions of a user live in one hash `{TOKEN_REDIS_PREFIX}:{user_id}`, each field is a session UUID
+    holding the token fingerprint, expiry and extra information. A global sorted set ordered by expiry
+    is used to prune expired sessions and to page through all sessions, so revocation costs
+    O(sessions of the user) and no operation scans the keyspace. Unlisted sessions are left out of the
+    sorted set, they are never paged and expire with the hash of their user. Refresh tokens are kept
+    the same way in `{TOKEN_REFRESH_REDIS_PREFIX}:{user_id}`, keyed by fingerprint
+    """
+
+    # Maximum number of expired sessions removed per prune
+    prune_batch_size: int = 100
+
+    @staticmethod
+    def fingerprint(token: str) -> str:
+        """
+        Get token fingerprint, tokens themselves are never stored
+
+        :param token: Token
+        :return:
+        """
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    @staticmethod
+    def session_key(user_id: int) -> str:
+        """
+        Get session hash key of a user
+
+        :param user_id: User ID
+        :return:
+        """
+        return f"{settings.TOKEN_REDIS_PREFIX}:{user_id}"
+
+    @staticmethod
+    def refresh_key(user_id: int) -> str:
+        """
+        Get refresh token hash key of a user
+
+        :param user_id: User ID
+        :return:
+        """
+        return f"{settings.TOKEN_REFRESH_REDIS_PREFIX}:{user_id}"
+
+    @staticmethod
+    def parse(
+        user_id: int, session_uuid: str, value: str | None
+    ) -> TokenSession | None:
+        """
+        Parse stored session, expired sessions are treated as missing
+
+        :param user_id: User ID
+        :param session_uuid: Session UUID
+        :param value: Stored session
+        :return:
+        """
+        if not value:
+            return None
+        data = json.loads(value)
+        if data["expire_time"] <= time.time():
+            return None
+        return TokenSession(
+            user_id=user_id,
+            session_uuid=session_uuid,
+            fingerprint=data["fingerprint"],
+            expire_time=data["expire_time"],
+            extra_info=data["extra_info"],
+        )
+
+    async def create(
+        self,
+        user_id: int,
+        session_uuid: str,
+        token: str,
+        expire_time: int,
+        *,
+        exclusive: bool,
+        listed: bool = True,
+        extra_info: dict[str, Any] | None = None,
+    ) -> None:
+        """
+        Register session
+
+        :param user_id: User ID
+        :param session_uuid: Session UUID
+        :param token: Access token
+        :param expire_time: Expiry timestamp
+        :param exclusive: Revoke other sessions of the user
+        :param listed: Whether the session is listed in the pages of all sessions
+        :param extra_info: Additional session information
+        :return:
+        """
+        key = self.session_key(user_id)
+        stale_sessions = await redis_client.hkeys(key) if exclusive else []
+        value = json.dumps(
+            {
+                "fingerprint": self.fingerprint(token),
+                "expire_time": expire_time,
+                "extra_info": extra_info or {},
+            },
+            ensure_ascii=False,
+        )
+        async with redis_client.pipeline(transaction=True) as pipe:
+            if stale_sessions:
+                pipe.delete(key)
+                pipe.zrem(
+                    settings.TOKEN_EXPIRY_REDIS_KEY,
+                    *[f"{user_id}:{session}" for session in stale_sessions],
+                )
+            pipe.hset(key, session_uuid, value)
+            # All sessions share the same lifetime, the newest one expires last
+            pipe.expireat(key, expire_time)
+            if listed:
+                pipe.zadd(
+                    settings.TOKEN_EXPIRY_REDIS_KEY,
+                    {f"{user_id}:{session_uuid}": expire_time},
+                )
+            await pipe.execute()
+        await self.prune()
+
+    async def get(self, user_id: int, session_uuid: str) -> TokenSession | None:
+        """
+        Get session
+
+        :param user_id: User ID
+        :param session_uuid: Session UUID
+        :return:
+        """
+        value = await redis_client.hget(self.session_key(user_id), session_uuid)
+        return self.parse(user_id, session_uuid, value)
+
+    async def get_user_sessions(self, user_id: int) -> list[TokenSession]:
+        """
+        Get all sessions of a user
+
+        :param user_id: User ID
+        :return:
+        """
+        values = await redis_client.hgetall(self.session_key(user_id))
+        sessions = [
+            self.parse(user_id, session_uuid, value)
+            for session_uuid, value in values.items()
+        ]
+        return sorted(
+            [session for session in sessions if session],
+            key=lambda session: session.expire_time,
+        )
+
+    async def get_sessions(
+        self, offset: int, limit: int
+    ) -> tuple[int, list[TokenSession]]:
+        """
+        Get a page of unexpired sessions of all users, ordered by expiry
+
+        :param offset: Offset
+        :param limit: Limit
+        :return:
+        """
+        now = time.time()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.zcount(settings.TOKEN_EXPIRY_REDIS_KEY, f"({now}", "+inf")
+            pipe.zrangebyscore(
+                settings.TOKEN_EXPIRY_REDIS_KEY,
+                f"({now}",
+                "+inf",
+                start=offset,
+                num=limit,
+            )
+            total, members = await pipe.execute()
+        if not members:
+            return total, []
+        members = [member.split(":", 1) for member in members]
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for user_id, session_uuid in members:
+                pipe.hget(self.session_key(int(user_id)), session_uuid)
+            values = await pipe.execute()
+        sessions = [
+            self.parse(int(user_id), session_uuid, value)
+            for (user_id, session_uuid), value in zip(members, values)
+        ]
+        return total, [session for session in sessions if session]
+
+    async def revoke(self, user_id: int, session_uuid: str) -> None:
+        """
+        Revoke session
+
+        :param user_id: User ID
+        :param session_uuid: Session UUID
+        :return:
+        """
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hdel(self.session_key(user_id), session_uuid)
+            pipe.zrem(settings.TOKEN_EXPIRY_REDIS_KEY, f"{user_id}:{session_uuid}")
+            await pipe.execute()
+
+    async def revoke_all(
+        self, user_id: int, *, exclude: str | None = None
+    ) -> list[str]:
+        """
+        Revoke all sessions of a user
+
+        :param user_id: User ID
+        :param exclude: Session UUID to keep
+        :return: Revoked session UUIDs
+        """
+        key = self.session_key(user_id)
+        sessions = [
+            session for session in await redis_client.hkeys(key) if session != exclude
+        ]
+        if not sessions:
+            return []
+        async with redis_client.pipeline(transaction=True) as pipe:
+            if exclude is None:
+                pipe.delete(key)
+            else:
+                pipe.hdel(key, *sessions)
+            pipe.zrem(
+                settings.TOKEN_EXPIRY_REDIS_KEY,
+                *[f"{user_id}:{session}" for session in sessions],
+            )
+            await pipe.execute()
+        return sessions
+
+    async def prune(self) -> None:
+        """Remove a batch of expired sessions"""
+        members = await redis_client.zrangebyscore(
+            settings.TOKEN_EXPIRY_REDIS_KEY,
+            "-inf",
+            time.time(),
+            start=0,
+            num=self.prune_batch_size,
+        )
+        if not members:
+            return
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for member in members:
+                user_id, session_uuid = member.split(":", 1)
+                pipe.hdel(self.session_key(int(user_id)), session_uuid)
+            pipe.zrem(settings.TOKEN_EXPIRY_REDIS_KEY, *members)
+            await pipe.execute()
+
+    async def create_refresh(
+        self, user_id: int, refresh_token: str, expire_time: int, *, exclusive: bool
+    ) -> None:
+        """
+        Register refresh token
+
+        :param user_id: User ID
+        :param refresh_token: Refresh token
+        :param expire_time: Expiry timestamp
+        :param exclusive: Revoke other refresh tokens of the user
+        :return:
+        """
+        key = self.refresh_key(user_id)
+        async with redis_client.pipeline(transaction=True) as pipe:
+            if exclusive:
+                pipe.delete(key)
+            pipe.hset(key, self.fingerprint(refresh_token), expire_time)
+            pipe.expireat(key, expire_time)
+            await pipe.execute()
+
+    async def verify_refresh(self, user_id: int, refresh_token: str) -> bool:
+        """
+        Check whether refresh token is registered and unexpired
+
+        :param user_id: User ID
+        :param refresh_token: Refresh token
+        :return:
+        """
+        expire_time = await redis_client.hget(
+            self.refresh_key(user_id), self.fingerprint(refresh_token)
+        )
+        return expire_time is not None and int(expire_time) > time.time()
+
+    async def revoke_refresh(
+        self, user_id: int, refresh_token: str | None = None
+    ) -> None:
+        """
+        Revoke refresh token
+
+        :param user_id: User ID
+        :param refresh_token: Refresh token, all refresh tokens of the user are revoked if not specified
+        :return:
+        """
+        key = self.refresh_key(user_id)
+        if refresh_token is None:
+            await redis_client.delete(key)
+        else:
+            await redis_client.hdel(key, self.fingerprint(refresh_token))
+
+
+session_registry: SessionRegistry = SessionRegistry()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+import msgspec
+from cachetools import TTLCache
+from redis.exceptions import LockError
+
+from common.log import log
+from common.security.principal import Principal
+from core.conf import settings
+from database.redis import redis_client
+
+# Invalidation message that clears every entry of every worker
+_INVALIDATE_ALL = "*"
+
+# Shared data a cached user is built from, each scope has its own generation counter
+GENERATION_SCOPES: tuple[str, ...] = ("dept", "role", "menu", "rule")
+
+
+class _CachedPrincipal(msgspec.Struct):
+    """Principal cached in Redis, with the generation counters and time it was built with"""
+
+    generation: list[int]
+    principal: Principal
+    built_time: float = 0
+
+
+_encoder = msgspec.json.Encoder()
+_decoder = msgspec.json.Decoder(_CachedPrincipal)
+
+
+class UserCache:
+    """
+    Process-local cache of authenticated users
+
+    Entries are keyed by (user ID, session UUID) and hold the token they were issued for, so a hit
+    skips both Redis lookups and the pydantic decode of the cached user. Entries also hold the
+    expiry of their session and are not served past it, opaque tokens carry no expiry of their own.
+    Every worker subscribes to a Redis pub/sub channel, invalidations are broadcast so that no
+    worker serves a stale user
+
+    Users cached in Redis carry the generation counters of the departments, roles, menus and data
+    rules they were built from. Changing any of those bumps one counter instead of deleting the
+    cache of every affected user, stale users are rebuilt lazily on their next request
+
+    Concurrent requests for a user that is not cached share a single load, optionally coalesced
+    across workers by a Redis lock. Users cached for longer than the soft expiry are still served
+    and refreshed in the background, only a missing or outdated user makes a request wait
+    """
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        """
+        Initialize user cache
+
+        :param maxsize: Maximum number of cached users
+        :param ttl: Entry lifetime in seconds
+        :return:
+        """
+        self._cache: TTLCache[tuple[int, str], tuple[str, int, Principal]] = TTLCache(
+            maxsize=maxsize, ttl=ttl
+        )
+        self._loading: dict[tuple[int, tuple[int, ...]], asyncio.Task[Principal]] = {}
+        self._stats: dict[str, int] = dict.fromkeys(
+            ("local_hit", "hit", "stale_hit", "miss", "refresh", "load"), 0
+        )
+
+    def get(self, user_id: int, session_uuid: str, token: str) -> Principal | None:
+        """
+        Get cached user
+
+        :param user_id: User ID
+        :param session_uuid: Session UUID
+        :param token: Token the user was cached for
+        :return:
+        """
+        entry = self._cache.get((user_id, session_uuid))
+        if entry is None or entry[0] != token:
+            return None
+        if entry[1] <= time.time():
+            self._cache.pop((user_id, session_uuid), None)
+            return None
+        self._stats["local_hit"] += 1
+        return entry[2]
+
+    def set(
+        self,
+        user_id: int,
+        session_uuid: str,
+        token: str,
+        expire_time: int,
+        user: Principal,
+    ) -> None:
+        """
+        Cache user
+
+        :param user_id: User ID
+        :param session_uuid: Session UUID
+        :param token: Token the user is cached for
+        :param expire_time: Session expiry timestamp
+        :param user: User information
+        :return:
+        """
+        self._cache[(user_id, session_uuid)] = (token, expire_time, user)
+
+    def evict(self, user_id: int, session_uuid: str | None = None) -> None:
+        """
+        Evict cached entries of this worker
+
+        :param user_id: User ID
+        :param session_uuid: Session UUID, all sessions of the user are evicted if not specified
+        :return:
+        """
+        if session_uuid is not None:
+            self._cache.pop((user_id, session_uuid), None)
+            return
+        for key in [key for key in self._cache.keys() if key[0] == user_id]:
+            self._cache.pop(key, None)
+
+    def clear(self) -> None:
+        """Evict all cached entries of this worker"""
+        self._cache.clear()
+
+    @staticmethod
+    async def publish(message: str) -> None:
+        """
+        Broadcast invalidation message to all workers
+
+        :param message: Invalidation message
+        :return:
+        """
+        await redis_client.publish(settings.JWT_USER_INVALIDATE_CHANNEL, message)
+
+    async def invalidate(self, *user_ids: int) -> None:
+        """
+        Invalidate cached user information in Redis and in every worker
+
+        :param user_ids: User ID list
+        :return:
+        """
+        if not user_ids:
+            return
+        await redis_client.delete(*[self.key(user_id) for user_id in user_ids])
+        for user_id in user_ids:
+            self.evict(user_id)
+        await self.publish(",".join(str(user_id) for user_id in user_ids))
+
+    async def revoke(self, user_id: int, session_uuid: str | None = None) -> None:
+        """
+        Invalidate cached sessions in every worker, used when tokens are revoked
+
+        :param user_id: User ID
+        :param session_uuid: Session UUID, all sessions of the user are revoked if not specified
+        :return:
+        """
+        self.evict(user_id, session_uuid)
+        await self.publish(
+            f"{user_id}:{session_uuid}" if session_uuid else str(user_id)
+        )
+
+    async def invalidate_all(self) -> None:
+        """Invalidate all cached sessions in every worker"""
+        self.clear()
+        await self.publish(_INVALIDATE_ALL)
+
+    @staticmethod
+    def parse_generation(values: list[str | None]) -> list[int]:
+        """
+        Parse generation counters, as returned by HMGET of all generation scopes
+
+        :param values: Counter values
+        :return:
+        """
+        return [int(value or 0) for value in values]
+
+    @staticmethod
+    def dump(user: Principal, generation: list[int]) -> str:
+        """
+        Serialize user for the Redis cache
+
+        :param user: User principal
+        :param generation: Generation counters the user was built with
+        :return:
+        """
+        return _encoder.encode(_CachedPrincipal(generation, user, time.time())).decode()
+
+    @staticmethod
+    def load(value: str | None, generation: list[int]) -> _CachedPrincipal | None:
+        """
+        Deserialize user from the Redis cache, users built with older generations are treated as missing
+
+        :param value: Cached value
+        :param generation: Current generation counters
+        :return:
+        """
+        if not value:
+            return None
+        try:
+            cached = _decoder.decode(value)
+        except msgspec.DecodeError:
+            # Written by an older release
+            return None
+        if cached.generation != generation:
+            return None
+        return cached
+
+    @staticmethod
+    def is_stale(cached: _CachedPrincipal) -> bool:
+        """
+        Check whether cached user is past its soft expiry
+
+        :param cached: Cached user
+        :return:
+        """
+        return (
+            time.time() - cached.built_time
+            > settings.JWT_USER_REDIS_SOFT_EXPIRE_SECONDS
+        )
+
+    async def resolve(
+        self,
+        user_id: int,
+        generation: list[int],
+        value: str | None,
+        loader: Callable[[int], Awaitable[Principal]],
+    ) -> Principal:
+        """
+        Get user from its Redis cache value, loading it if missing or refreshing it if stale
+
+        :param user_id: User ID
+        :param generation: Current generation counters
+        :param value: Cached value
+        :param loader: Loads the user from the database
+        :return:
+        """
+        cached = self.load(value, generation)
+        if cached is None:
+            self._stats["miss"] += 1
+            return await self.get_or_load(user_id, generation, loader)
+        if self.is_stale(cached):
+            self._stats["stale_hit"] += 1
+            if (user_id, tuple(generation)) not in self._loading:
+                self._stats["refresh"] += 1
+                task = self._start_load(user_id, generation, loader)
+                task.add_done_callback(self._log_refresh_error)
+        else:
+            self._stats["hit"] += 1
+        return cached.principal
+
+    @staticmethod
+    def _log_refresh_error(task: asyncio.Task[Principal]) -> None:
+        """
+        Log failed background refresh, the stale user keeps being served until it expires
+
+        :param task: Refresh task
+        :return:
+        """
+        if not task.cancelled() and task.exception() is not None:
+            log.warning(f"User cache refresh exception: {task.exception()}")
+
+    def stats(self) -> dict[str, int]:
+        """Get cache counters of this worker"""
+        return {**self._stats, "size": len(self._cache), "loading": len(self._loading)}
+
+    @staticmethod
+    def key(user_id: int) -> str:
+        """
+        Get Redis cache key of a user
+
+        :param user_id: User ID
+        :return:
+        """
+        return f"{settings.JWT_USER_REDIS_PREFIX}:{user_id}"
+
+    async def get_or_load(
+        self,
+        user_id: int,
+        generation: list[int],
+        loader: Callable[[int], Awaitable[Principal]],
+    ) -> Principal:
+        """
+        Load user that is not cached, concurrent calls for the same user and generations share one load
+
+        :param user_id: User ID
+        :param generation: Current generation counters
+        :param loader: Loads the user from the database
+        :return:
+        """
+        task = self._loading.get((user_id, tuple(generation)))
+        if task is None:
+            task = self._start_load(user_id, generation, loader)
+        # A cancelled caller must not cancel the load other callers are waiting for
+        return await asyncio.shield(task)
+
+    def _start_load(
+        self,
+        user_id: int,
+        generation: list[int],
+        loader: Callable[[int], Awaitable[Principal]],
+    ) -> asyncio.Task[Principal]:
+        """
+        Start loading user, registered until done so that concurrent calls can join it
+
+        :param user_id: User ID
+        :param generation: Current generation counters
+        :param loader: Loads the user from the database
+        :return:
+        """
+        key = (user_id, tuple(generation))
+        task = asyncio.create_task(self._load(user_id, generation, loader))
+        self._loading[key] = task
+        task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return task
+
+    async def _load(
+        self,
+        user_id: int,
+        generation: list[int],
+        loader: Callable[[int], Awaitable[Principal]],
+    ) -> Principal:
+        """
+        Load user and cache it in Redis
+
+        :param user_id: User ID
+        :param generation: Current generation counters
+        :param loader: Loads the user from the database
+        :return:
+        """
+        if not settings.JWT_USER_LOAD_LOCK:
+            return await self._load_and_cache(user_id, generation, loader)
+        lock = redis_client.lock(
+            f"{settings.JWT_USER_REDIS_PREFIX}:lock:{user_id}",
+            timeout=settings.JWT_USER_LOAD_LOCK_TIMEOUT_SECONDS,
+            blocking_timeout=settings.JWT_USER_LOAD_LOCK_TIMEOUT_SECONDS,
+        )
+        # Load anyway if the lock holder takes too long
+        acquired = await lock.acquire()
+        try:
+            if acquired:
+                # Another worker may have loaded the user while this one was waiting
+                cached = self.load(
+                    await redis_client.get(self.key(user_id)), generation
+                )
+                if cached and not self.is_stale(cached):
+                    return cached.principal
+            return await self._load_and_cache(user_id, generation, loader)
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except LockError:
+                    # Expired while loading
+                    pass
+
+    async def _load_and_cache(
+        self,
+        user_id: int,
+        generation: list[int],
+        loader: Callable[[int], Awaitable[Principal]],
+    ) -> Principal:
+        """
+        Load user and cache it in Redis without coalescing
+
+        :param user_id: User ID
+        :param generation: Current generation counters
+        :param loader: Loads the user from the database
+        :return:
+        """
+        self._stats["load"] += 1
+        user = await loader(user_id)
+        await redis_client.setex_many(
+            [
+                (
+                    self.key(user_id),
+                    settings.JWT_USER_REDIS_EXPIRE_SECONDS,
+                    self.dump(user, generation),
+                )
+            ]
+        )
+        return user
+
+    async def bump(self, *scopes: str) -> None:
+        """
+        Bump generation counters, cached users depending on them become stale in Redis and in every worker
+
+        :param scopes: Generation scopes
+        :return:
+        """
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for scope in scopes:
+                pipe.hincrby(settings.JWT_USER_GENERATION_REDIS_KEY, scope, 1)
+            await pipe.execute()
+        await self.invalidate_all()
+
+    def handle_message(self, message: str) -> None:
+        """
+        Apply invalidation message, formatted as `*` or comma separated `user_id[:session_uuid]`
+
+        :param message: Invalidation message
+        :return:
+        """
+        if message == _INVALIDATE_ALL:
+            self.clear()
+            return
+        for item in message.split(","):
+            user_id, _, session_uuid = item.partition(":")
+            self.evict(int(user_id), session_uuid or None)
+
+    async def listen(self) -> None:
+        """Subscribe to invalidation messages, reconnecting until cancelled"""
+        while True:
+            pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(settings.JWT_USER_INVALIDATE_CHANNEL)
+                # Anything may have changed while not subscribed
+                self.clear()
+                async for message in pubsub.listen():
+                    try:
+                        self.handle_message(message["data"])
+                    except ValueError:
+                        log.warning(f"Invalid user cache message: {message['data']}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.error(f"User cache invalidation subscriber exception: {e}")
+                self.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+user_cache: UserCache = UserCache(
+    maxsize=settings.JWT_USER_LOCAL_CACHE_MAXSIZE,
+    ttl=settings.JWT_USER_LOCAL_CACHE_TTL_SECONDS,
+)
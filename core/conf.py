@@ -24,6 +24,36 @@ class Settings(BaseSettings):
     DATABASE_RETRY_INTERVAL: int = 1
     DATABASE_MAX_RETRIES: int = 3
 
+    # Database engine
+    DATABASE_ECHO: bool = False
+    DATABASE_APPLICATION_NAME: str = "pfa"
+    DATABASE_POOL_SIZE: int = 10
+    DATABASE_POOL_MAX_OVERFLOW: int = 20
+    DATABASE_POOL_TIMEOUT_SECONDS: float = 30
+    DATABASE_POOL_RECYCLE_SECONDS: int = 60 * 30
+    DATABASE_POOL_PRE_PING: bool = True
+    DATABASE_POOL_USE_LIFO: bool = False
+    DATABASE_CONNECT_TIMEOUT_SECONDS: float = 10
+    DATABASE_COMMAND_TIMEOUT_SECONDS: float | None = None
+    # Compiled SQL cache of SQLAlchemy, per engine
+    DATABASE_QUERY_CACHE_SIZE: int = 500
+    # Prepared statement caches of SQLAlchemy and asyncpg, per connection
+    DATABASE_PREPARED_STATEMENT_CACHE_SIZE: int = 100
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100
+    # Connect through pgbouncer in transaction pooling mode: connections are not pooled by the
+    # engine, statement caches are disabled and prepared statements are uniquely named
+    DATABASE_PGBOUNCER: bool = False
+    # Replicas lagging more than this are skipped, reads fall back to the primary
+    DATABASE_REPLICA_MAX_LAG_SECONDS: float = 5
+    DATABASE_REPLICA_CHECK_INTERVAL_SECONDS: float = 5
+    DATABASE_REPLICA_CHECK_TIMEOUT_SECONDS: float = 2
+    # Per-request query statistics, sent as response headers in dev and logged otherwise
+    DATABASE_QUERY_STATS: bool = True
+    # Default number of queries a request may issue before a warning, see `QueryBudget`
+    DATABASE_QUERY_BUDGET: int = 30
+    # Statements executed this many times in one request are reported as possible N+1 queries
+    DATABASE_QUERY_REPEAT_THRESHOLD: int = 5
+
     # PostgreSQL
     POSTGRES_HOST: str
     POSTGRES_USER: str
@@ -35,6 +65,17 @@ class Settings(BaseSettings):
     def POSTGRES_URL(self) -> str:
         return f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_HOST}/{self.POSTGRES_DB}"
 
+    # PostgreSQL read replicas, sharing the credentials and database of the primary
+    POSTGRES_REPLICA_HOSTS: list[str] = []
+
+    @computed_field
+    @property
+    def POSTGRES_REPLICA_URLS(self) -> list[str]:
+        return [
+            f"postgresql+asyncpg://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{host}/{self.POSTGRES_DB}"
+            for host in self.POSTGRES_REPLICA_HOSTS
+        ]
+
     # Redis
     REDIS_HOST: str
     REDIS_PORT: int
@@ -81,11 +122,14 @@ class Settings(BaseSettings):
     LOG_DIR: str = "logs"
 
     # Token
+    TOKEN_MODE: str = "jwt"  # jwt, opaque
     TOKEN_ALGORITHM: str = "HS256"
     TOKEN_EXPIRE_SECONDS: int = 60 * 60 * 24 * 1
     TOKEN_REFRESH_EXPIRE_SECONDS: int = 60 * 60 * 24 * 7
     TOKEN_REDIS_PREFIX: str = "pfa:token"
     TOKEN_REFRESH_REDIS_PREFIX: str = "pfa:refresh_token"
+    TOKEN_EXPIRY_REDIS_KEY: str = "pfa:token_expiry"
+    TOKEN_DECODE_CACHE_MAXSIZE: int = 4096
     TOKEN_REQUEST_PATH_EXCLUDE: list[str] = [
         f"{FASTAPI_API_V1_PATH}/auth/login",
     ]
@@ -94,6 +138,45 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     JWT_EXPIRES_IN: int = 60 * 60 * 24 * 7  # 1 week
+    JWT_USER_REDIS_PREFIX: str = "pfa:user"
+    JWT_USER_REDIS_EXPIRE_SECONDS: int = 60 * 60 * 24 * 7
+    # Older cached users are still served while being refreshed in the background
+    JWT_USER_REDIS_SOFT_EXPIRE_SECONDS: int = 60 * 60
+    JWT_USER_GENERATION_REDIS_KEY: str = "pfa:user:generation"
+
+    # JWT user local (per-worker) cache
+    JWT_USER_LOCAL_CACHE_MAXSIZE: int = 1024
+    JWT_USER_LOCAL_CACHE_TTL_SECONDS: int = 60
+    JWT_USER_INVALIDATE_CHANNEL: str = "pfa:user:invalidate"
+    # Coalesce loads of the same user across workers with a Redis lock
+    JWT_USER_LOAD_LOCK: bool = False
+    JWT_USER_LOAD_LOCK_TIMEOUT_SECONDS: int = 5
+
+    # Password hash
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # thread, process
+    PASSWORD_HASH_MAX_WORKERS: int = 4
+    PASSWORD_HASH_MAX_CONCURRENCY: int = 4
+
+    # RBAC
+    RBAC_ROLE_MENU_MODE: bool = True
+    RBAC_ROLE_MENU_EXCLUDE: list[str] = [
+        "sys:monitor:redis",
+        "sys:monitor:server",
+    ]
+    RBAC_POLICY_RELOAD_CHANNEL: str = "pfa:rbac:policy:reload"
+
+    # Menu tree cache, per role set
+    MENU_TREE_REDIS_PREFIX: str = "pfa:menu:tree"
+    MENU_TREE_REDIS_EXPIRE_SECONDS: int = 60 * 60 * 24
+    MENU_TREE_GENERATION_REDIS_KEY: str = "pfa:menu:tree:generation"
+    MENU_TREE_LOCAL_CACHE_MAXSIZE: int = 256
+
+    # Pagination
+    PAGINATION_COUNT_TYPE: str = "exact"  # exact, cached, estimate, has_next
+    PAGINATION_COUNT_REDIS_PREFIX: str = "pfa:pagination:count"
+    PAGINATION_COUNT_CACHE_SECONDS: int = 60
+    # Planner estimates below this are replaced by exact counts, they are unreliable when small
+    PAGINATION_COUNT_ESTIMATE_THRESHOLD: int = 10000
 
     # Default User
     DEFAULT_USER: str = "admin"
@@ -1,12 +1,14 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 
 from app.router import router
 from common.exception.exception_handler import register_exception
 from common.log import log
 from common.response.response_schema import CustomResponse, response_base
 from core.conf import settings
+from database.db import get_db
 from middleware.request_id_middleware import RequestIdMiddleware
 from utils.serializers import MsgSpecJSONResponse
 from utils.string import generate_unique_id
@@ -48,6 +50,12 @@ def register_middleware(app: FastAPI):
             expose_headers=settings.CORS_EXPOSE_HEADERS,
         )
 
+    # Query statistics, inside the request ID middleware which resets them per request
+    if settings.DATABASE_QUERY_STATS:
+        from middleware.query_stats_middleware import QueryStatsMiddleware
+
+        app.add_middleware(QueryStatsMiddleware)
+
     app.add_middleware(RequestIdMiddleware)
 
 
@@ -76,8 +84,47 @@ def register_app(init_db: bool = True) -> FastAPI:
                 except Exception as e:
                     log.error(f"Failed to initialize development data: {str(e)}")
 
+            # Index department and menu hierarchies created without the DAOs
+            try:
+                from app.admin.crud.crud_dept import dept_dao
+                from app.admin.crud.crud_menu import menu_dao
+                from database.db import AsyncSessionLocal
+
+                async with AsyncSessionLocal.begin() as db:
+                    for dao in (dept_dao, menu_dao):
+                        if await dao.sync_closure(db):
+                            log.info(f"Closure table {dao.closure.name} rebuilt")
+            except Exception as e:
+                log.error(f"Failed to sync hierarchy closure tables: {str(e)}")
+
+            # Keep the local user cache of this worker in sync with other workers
+            from common.security.user_cache import user_cache
+
+            listeners = [asyncio.create_task(user_cache.listen())]
+
+            # Load RBAC policies and keep them in sync with other workers
+            if not settings.RBAC_ROLE_MENU_MODE:
+                from common.security.policy import policy_engine
+
+                listeners.append(asyncio.create_task(policy_engine.listen()))
+
+            # Check replication lag of read replicas
+            from database.replica import replica_router
+
+            if replica_router.replicas:
+                listeners.append(asyncio.create_task(replica_router.listen()))
+
             yield
 
+            for listener in listeners:
+                listener.cancel()
+                with suppress(asyncio.CancelledError):
+                    await listener
+
+            from common.security.password import password_hash_executor
+
+            password_hash_executor.shutdown()
+
     app = FastAPI(
         title=settings.PROJECT_NAME,
         version=settings.VERSION,
@@ -89,6 +136,8 @@ def register_app(init_db: bool = True) -> FastAPI:
         docs_url=settings.FASTAPI_DOCS_URL,
         redoc_url=settings.FASTAPI_REDOCS_URL,
         openapi_url=settings.FASTAPI_OPENAPI_URL,
+        # One unit of work per request, shared by all its service calls
+        dependencies=[Depends(get_db)],
     )
 
     register_middleware(app)
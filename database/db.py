@@ -1,22 +1,94 @@
 import ssl
 import sys
 import time
-from typing import Annotated
+from typing import Annotated, Any, AsyncGenerator
+from uuid import uuid4
 
 from fastapi import Depends
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.sql import text
 
 from common.log import log
 from common.model import Base
 from core.conf import settings
+from database.monitor import (
+    MonitoredNullPool,
+    MonitoredQueuePool,
+    PoolMonitor,
+    instrument_queries,
+)
+from database.replica import RoutingSession, replica_router
+from database.uow import UnitOfWork
 
 # Use PostgreSQL database URL
 db_url = settings.POSTGRES_URL
 
-# Initialize the asynchronous database engine and session factory
-engine = create_async_engine(db_url, echo=True)
-AsyncSessionLocal = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+def create_database_engine(url: str, name: str) -> AsyncEngine:
+    """
+    Create database engine configured by settings, with pool telemetry
+
+    :param url: Database URL
+    :param name: Engine name, reported by pool monitoring
+    :return:
+    """
+    connect_args: dict[str, Any] = {
+        "timeout": settings.DATABASE_CONNECT_TIMEOUT_SECONDS,
+        "command_timeout": settings.DATABASE_COMMAND_TIMEOUT_SECONDS,
+        "server_settings": {"application_name": settings.DATABASE_APPLICATION_NAME},
+        "prepared_statement_cache_size": settings.DATABASE_PREPARED_STATEMENT_CACHE_SIZE,
+        "statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE,
+    }
+    options: dict[str, Any] = {
+        "echo": settings.DATABASE_ECHO,
+        "query_cache_size": settings.DATABASE_QUERY_CACHE_SIZE,
+        "pool_logging_name": name,
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+    }
+    if settings.DATABASE_PGBOUNCER:
+        # pgbouncer pools server connections itself, a statement prepared on one of them is
+        # unknown to the others
+        connect_args.update(
+            prepared_statement_cache_size=0,
+            statement_cache_size=0,
+            prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+        )
+        options.update(poolclass=MonitoredNullPool)
+    else:
+        options.update(
+            poolclass=MonitoredQueuePool,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_POOL_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DATABASE_POOL_RECYCLE_SECONDS,
+            pool_use_lifo=settings.DATABASE_POOL_USE_LIFO,
+        )
+    engine = create_async_engine(url, connect_args=connect_args, **options)
+    PoolMonitor(name).instrument(engine)
+    instrument_queries(engine)
+    return engine
+
+
+# Initialize the asynchronous database engines and session factory
+engine = create_database_engine(db_url, "primary")
+replica_router.configure(
+    engine,
+    {
+        f"replica{index}": create_database_engine(url, f"replica{index}")
+        for index, url in enumerate(settings.POSTGRES_REPLICA_URLS)
+    },
+)
+# Reads of read-only services and routes are served by replicas when configured
+async_session_factory = async_sessionmaker(
+    bind=engine, sync_session_class=RoutingSession, expire_on_commit=False
+)
+# Sessions of a request share the request unit of work
+AsyncSessionLocal = UnitOfWork(async_session_factory)
 
 
 async def init_db():
@@ -34,17 +106,10 @@ async def init_db():
         raise
 
 
-async def get_db():
-    """Provide a database session with explicit transaction management."""
-    async with AsyncSessionLocal() as session:
-        try:
-            yield session
-            await session.commit()
-        except Exception:
-            await session.rollback()
-            raise
-        finally:
-            await session.close()
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
+    """Provide the request unit of work session, committed when the request ends."""
+    async with AsyncSessionLocal.scope() as session:
+        yield session
 
 
 async def check_database_connection(
@@ -77,4 +142,4 @@ async def check_database_connection(
                 time.sleep(retry_interval)
 
 
-CurrentSession = Annotated[AsyncSessionLocal, Depends(get_db)]
+CurrentSession = Annotated[AsyncSession, Depends(get_db)]
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import time
+from bisect import bisect_left
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+
+from utils.request_id import get_query_stats
+
+
+class Histogram:
+    """Histogram of durations, bucketed in milliseconds"""
+
+    # Upper bounds of the buckets, in milliseconds
+    buckets: tuple[float, ...] = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+    def __init__(self) -> None:
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)
+        self.count: int = 0
+        self.sum: float = 0.0
+        self.max: float = 0.0
+
+    def observe(self, seconds: float) -> None:
+        """
+        Record a duration
+
+        :param seconds: Duration in seconds
+        :return:
+        """
+        ms = seconds * 1000
+        self.counts[bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.sum += ms
+        self.max = max(self.max, ms)
+
+    def stats(self) -> dict[str, Any]:
+        """Get count, sum, maximum and cumulative bucket counts"""
+        buckets = {}
+        total = 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {
+            "count": self.count,
+            "sum_ms": round(self.sum, 3),
+            "avg_ms": round(self.sum / self.count, 3) if self.count else 0,
+            "max_ms": round(self.max, 3),
+            "buckets": buckets,
+        }
+
+
+class PoolMonitor:
+    """
+    Connection pool telemetry of an engine, kept per worker
+
+    Checkouts, checkins, connects, closes and invalidations are counted with SQLAlchemy pool events,
+    which also track how long each connection has been open and each checkout has been held. Time
+    spent waiting for a connection is recorded by the monitored pool classes, since no pool event
+    fires before a checkout starts
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.engine: AsyncEngine | None = None
+        self.counters: dict[str, int] = dict.fromkeys(
+            ("connect", "close", "checkout", "checkin", "invalidate", "timeout"), 0
+        )
+        self.wait = Histogram()
+        self.hold = Histogram()
+        # Open time of pooled connections and checkout time of checked out ones, keyed by record
+        self._connected: dict[int, float] = {}
+        self._checked_out: dict[int, float] = {}
+
+    def instrument(self, engine: AsyncEngine) -> None:
+        """
+        Listen to pool events of an engine, they are kept when the pool is recreated
+
+        :param engine: Database engine
+        :return:
+        """
+        self.engine = engine
+        pool = engine.sync_engine.pool
+        event.listen(pool, "connect", self._on_connect)
+        event.listen(pool, "close", self._on_close)
+        event.listen(pool, "detach", self._on_detach)
+        event.listen(pool, "checkout", self._on_checkout)
+        event.listen(pool, "checkin", self._on_checkin)
+        event.listen(pool, "invalidate", self._on_invalidate)
+        pool_monitors[self.name] = self
+
+    def _on_connect(self, dbapi_connection: Any, connection_record: Any) -> None:
+        self.counters["connect"] += 1
+        self._connected[id(connection_record)] = time.monotonic()
+
+    def _on_close(self, dbapi_connection: Any, connection_record: Any) -> None:
+        self.counters["close"] += 1
+        self._connected.pop(id(connection_record), None)
+
+    def _on_detach(self, dbapi_connection: Any, connection_record: Any) -> None:
+        # Detached connections are no longer managed by the pool
+        self._connected.pop(id(connection_record), None)
+        self._checked_out.pop(id(connection_record), None)
+
+    def _on_checkout(
+        self, dbapi_connection: Any, connection_record: Any, connection_proxy: Any
+    ) -> None:
+        self.counters["checkout"] += 1
+        self._checked_out[id(connection_record)] = time.monotonic()
+
+    def _on_checkin(self, dbapi_connection: Any, connection_record: Any) -> None:
+        self.counters["checkin"] += 1
+        checkout_time = self._checked_out.pop(id(connection_record), None)
+        if checkout_time is not None:
+            self.hold.observe(time.monotonic() - checkout_time)
+
+    def _on_invalidate(
+        self, dbapi_connection: Any, connection_record: Any, exception: Any
+    ) -> None:
+        self.counters["invalidate"] += 1
+
+    @staticmethod
+    def _ages(start_times: list[float]) -> dict[str, Any]:
+        """
+        Get count, minimum, maximum and average age
+
+        :param start_times: Monotonic start times
+        :return:
+        """
+        now = time.monotonic()
+        ages = [now - start_time for start_time in start_times]
+        return {
+            "count": len(ages),
+            "min_seconds": round(min(ages), 3) if ages else 0,
+            "max_seconds": round(max(ages), 3) if ages else 0,
+            "avg_seconds": round(sum(ages) / len(ages), 3) if ages else 0,
+        }
+
+    def stats(self) -> dict[str, Any]:
+        """Get pool state and telemetry"""
+        pool = self.engine.sync_engine.pool
+        data: dict[str, Any] = {
+            "pool": pool.__class__.__name__,
+            "status": pool.status(),
+        }
+        if isinstance(pool, QueuePool):
+            data.update(
+                size=pool.size(),
+                checked_in=pool.checkedin(),
+                checked_out=pool.checkedout(),
+                # Negative while fewer connections than the pool size are open
+                overflow=max(pool.overflow(), 0),
+            )
+        else:
+            data.update(checked_out=len(self._checked_out))
+        data.update(
+            counters=dict(self.counters),
+            wait=self.wait.stats(),
+            hold=self.hold.stats(),
+            connection_age=self._ages(list(self._connected.values())),
+            checkout_age=self._ages(list(self._checked_out.values())),
+        )
+        return data
+
+
+def _before_cursor_execute(
+    conn: Any,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    conn.info.setdefault("query_start_time", []).append(time.monotonic())
+
+
+def _after_cursor_execute(
+    conn: Any,
+    cursor: Any,
+    statement: str,
+    parameters: Any,
+    context: Any,
+    executemany: bool,
+) -> None:
+    start = conn.info["query_start_time"].pop()
+    query_stats = get_query_stats()
+    if query_stats is not None:
+        query_stats.record(statement, time.monotonic() - start)
+
+
+def _handle_error(context: Any) -> None:
+    start_times = (
+        context.connection.info.get("query_start_time") if context.connection else None
+    )
+    if start_times:
+        start_times.pop()
+
+
+def instrument_queries(engine: AsyncEngine) -> None:
+    """
+    Record statements executed by an engine in the query statistics of the current request
+
+    :param engine: Database engine
+    :return:
+    """
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine.sync_engine, "handle_error", _handle_error)
+
+
+class QueryBudget:
+    """
+    Query budget of a route, a warning is logged when a request issues more queries
+
+    Used as a route dependency, e.g. `Depends(QueryBudget(50))`, overriding `DATABASE_QUERY_BUDGET`
+    """
+
+    def __init__(self, value: int) -> None:
+        """
+        Initialize query budget
+
+        :param value: Maximum number of queries
+        :return:
+        """
+        self.value = value
+
+    async def __call__(self) -> None:
+        query_stats = get_query_stats()
+        if query_stats is not None:
+            query_stats.budget = self.value
+
+
+class _MonitoredPoolMixin:
+    """Record time spent waiting for a connection, including time spent connecting"""
+
+    def connect(self):
+        monitor = pool_monitors.get(self.logging_name)
+        if monitor is None:
+            return super().connect()
+        start = time.monotonic()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            monitor.counters["timeout"] += 1
+            raise
+        finally:
+            monitor.wait.observe(time.monotonic() - start)
+
+
+class MonitoredQueuePool(_MonitoredPoolMixin, AsyncAdaptedQueuePool):
+    """Async queue pool recording connection wait time"""
+
+
+class MonitoredNullPool(_MonitoredPoolMixin, NullPool):
+    """Null pool recording connection wait time"""
+
+
+# Monitors of all engines, keyed by engine name, which is also the pool logging name
+pool_monitors: dict[str, PoolMonitor] = {}
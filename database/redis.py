@@ -57,6 +57,20 @@ class RedisCli(Redis):
         if keys:
             await self.delete(*keys)
 
+    async def setex_many(self, items: list[tuple[str, int, str]]) -> None:
+        """
+        Set multiple keys with expiration in a single round-trip
+
+        :param items: (key, expire seconds, value) list
+        :return:
+        """
+        if not items:
+            return
+        async with self.pipeline(transaction=False) as pipe:
+            for key, expire, value in items:
+                pipe.setex(key, expire, value)
+            await pipe.execute()
+
 
 # Redis Client
 redis_client = RedisCli()
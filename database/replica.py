@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+import itertools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import (
+    Any,
+    AsyncGenerator,
+    Awaitable,
+    Callable,
+    Generator,
+    ParamSpec,
+    TypeVar,
+)
+
+from fastapi import Depends
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from common.log import log
+from core.conf import settings
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+# Whether the current code only reads, and may be served by a replica
+_read_only: ContextVar[bool] = ContextVar("read_only", default=False)
+# Whether the current code must read from the primary, overriding read-only marks
+_use_primary: ContextVar[bool] = ContextVar("use_primary", default=False)
+
+# Replication lag of a replica in seconds, 0 when it has replayed everything it received, NULL
+# when it is not streaming from the primary, since it then receives nothing and falls behind
+# unnoticed. The WAL receiver status is only visible to roles with `pg_read_all_stats`, a running
+# receiver of hidden status is assumed to be streaming
+_REPLICA_LAG_SQL = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN NOT EXISTS ("
+    "SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming'"
+    ") THEN NULL"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+def read_only(func: Callable[P, Awaitable[R]]) -> Callable[P, Awaitable[R]]:
+    """
+    Mark a coroutine function as read-only, its queries may be served by a replica
+
+    :param func: Coroutine function
+    :return:
+    """
+
+    @wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        token = _read_only.set(True)
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _read_only.reset(token)
+
+    return wrapper
+
+
+async def read_only_route() -> AsyncGenerator[None, None]:
+    """Mark a route as read-only, its queries may be served by a replica"""
+    token = _read_only.set(True)
+    try:
+        yield
+    finally:
+        _read_only.reset(token)
+
+
+# Read-only route dependency injection
+DependsReadOnly = Depends(read_only_route)
+
+
+@contextmanager
+def use_primary() -> Generator[None, None, None]:
+    """
+    Read from the primary, even in read-only code
+
+    Used to read your own writes right after a mutation, which replicas may not have replayed yet
+    """
+    token = _use_primary.set(True)
+    try:
+        yield
+    finally:
+        _use_primary.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Router of database reads between the primary and its replicas
+
+    Reads of read-only code are balanced round-robin over healthy replicas. Replication lag of every
+    replica is checked periodically, replicas lagging more than `DATABASE_REPLICA_MAX_LAG_SECONDS`
+    or failing the check are skipped, and reads fall back to the primary when none is healthy
+    """
+
+    def __init__(self) -> None:
+        self.primary: AsyncEngine | None = None
+        self.replicas: dict[str, AsyncEngine] = {}
+        self._healthy: list[AsyncEngine] = []
+        self._lag: dict[str, float | None] = {}
+        self._counter = itertools.count()
+
+    def configure(self, primary: AsyncEngine, replicas: dict[str, AsyncEngine]) -> None:
+        """
+        Configure engines, replicas are considered healthy until checked
+
+        :param primary: Primary engine
+        :param replicas: Replica engines, keyed by name
+        :return:
+        """
+        self.primary = primary
+        self.replicas = replicas
+        self._healthy = list(replicas.values())
+        self._lag = dict.fromkeys(replicas)
+
+    @staticmethod
+    def is_read_only() -> bool:
+        """Check whether reads of the current code may be served by a replica"""
+        return _read_only.get() and not _use_primary.get()
+
+    def get_read_engine(self) -> AsyncEngine:
+        """Get engine serving reads of read-only code"""
+        if not self._healthy:
+            return self.primary
+        return self._healthy[next(self._counter) % len(self._healthy)]
+
+    async def get_lag(self, engine: AsyncEngine) -> float | None:
+        """
+        Get replication lag of a replica, None when it is not streaming from the primary
+
+        :param engine: Replica engine
+        :return:
+        """
+        async with engine.connect() as conn:
+            lag = await conn.scalar(_REPLICA_LAG_SQL)
+        return None if lag is None else float(lag)
+
+    async def check(self) -> None:
+        """Check replication lag of all replicas and update the healthy ones"""
+        healthy = []
+        for name, engine in self.replicas.items():
+            try:
+                lag = await asyncio.wait_for(
+                    self.get_lag(engine),
+                    settings.DATABASE_REPLICA_CHECK_TIMEOUT_SECONDS,
+                )
+            except Exception as e:
+                lag = None
+                if self._lag[name] is not None or engine in self._healthy:
+                    log.warning(f"Database replica {name} check failed: {e}")
+            else:
+                if lag is None:
+                    if engine in self._healthy:
+                        log.warning(f"Database replica {name} is not streaming")
+                elif lag <= settings.DATABASE_REPLICA_MAX_LAG_SECONDS:
+                    healthy.append(engine)
+                elif engine in self._healthy:
+                    log.warning(f"Database replica {name} is lagging {lag:.1f}s behind")
+            self._lag[name] = lag
+        self._healthy = healthy
+
+    async def listen(self) -> None:
+        """Check replicas periodically until cancelled"""
+        while True:
+            await self.check()
+            await asyncio.sleep(settings.DATABASE_REPLICA_CHECK_INTERVAL_SECONDS)
+
+    def stats(self) -> dict[str, Any]:
+        """Get replication lag and health of all replicas"""
+        return {
+            name: {"lag_seconds": self._lag[name], "healthy": engine in self._healthy}
+            for name, engine in self.replicas.items()
+        }
+
+
+replica_router: ReplicaRouter = ReplicaRouter()
+
+
+class RoutingSession(Session):
+    """
+    Session routing reads of read-only code to a replica
+
+    One read engine is chosen per session, so its read-only reads see one consistent replica, and
+    other reads of a session shared with non read-only code go to the primary. Writes and flushes
+    always go to the primary, and once a session has written, all its reads follow
+    """
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._read_bind: Engine | None = None
+        self._written = False
+
+    def get_bind(self, mapper: Any = None, clause: Any = None, **kwargs: Any) -> Engine:
+        if self._flushing or (clause is not None and not clause.is_select):
+            self._written = True
+        if self._written or not replica_router.is_read_only():
+            return replica_router.primary.sync_engine
+        if self._read_bind is None:
+            self._read_bind = replica_router.get_read_engine().sync_engine
+        return self._read_bind
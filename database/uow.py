@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+import asyncio
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import AsyncGenerator
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+@dataclass
+class _Scope:
+    """Unit of work of a request"""
+
+    session: AsyncSession
+    # Sessions are not safe to share between tasks, tasks spawned by the request get their own
+    task: asyncio.Task | None
+    # Depth of nested `begin()` blocks
+    depth: int = 0
+
+
+_scope: ContextVar[_Scope | None] = ContextVar("unit_of_work", default=None)
+
+
+class UnitOfWork:
+    """
+    Session factory sharing one session per request
+
+    Within a request scope, every `AsyncSessionLocal()` and `AsyncSessionLocal.begin()` of the
+    request task reuses the request session, so a request holds at most one connection at a time
+    instead of checking out one per service call. The outermost `begin()` block commits when it
+    exits, like a session of its own would, and nested ones are savepoints rolled back on error.
+    Outside a request scope, or in tasks spawned by the request, sessions are created as usual
+    """
+
+    def __init__(self, factory: async_sessionmaker[AsyncSession]) -> None:
+        self.factory = factory
+
+    @staticmethod
+    def _current() -> _Scope | None:
+        """Get unit of work of the current task"""
+        scope = _scope.get()
+        if scope is not None and scope.task is asyncio.current_task():
+            return scope
+        return None
+
+    @asynccontextmanager
+    async def scope(self) -> AsyncGenerator[AsyncSession, None]:
+        """Open a unit of work, committed when it exits and rolled back on error"""
+        current = self._current()
+        if current is not None:
+            yield current.session
+            return
+        async with self.factory() as session:
+            token = _scope.set(_Scope(session=session, task=asyncio.current_task()))
+            try:
+                yield session
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+            finally:
+                _scope.reset(token)
+
+    @asynccontextmanager
+    async def __call__(self) -> AsyncGenerator[AsyncSession, None]:
+        """Get session, the unit of work one if any"""
+        current = self._current()
+        if current is None:
+            async with self.factory() as session:
+                yield session
+        else:
+            yield current.session
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncGenerator[AsyncSession, None]:
+        """Get session in a transaction, a savepoint when nested in the unit of work"""
+        current = self._current()
+        if current is None:
+            async with self.factory.begin() as session:
+                yield session
+            return
+        session = current.session
+        if current.depth:
+            async with session.begin_nested():
+                yield session
+            return
+        current.depth += 1
+        try:
+            yield session
+            await session.commit()
+        except Exception:
+            await session.rollback()
+            raise
+        finally:
+            current.depth -= 1
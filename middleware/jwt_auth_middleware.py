@@ -11,10 +11,10 @@ from starlette.authentication import (
 )
 from starlette.requests import HTTPConnection
 
-from app.admin.schema.user import GetUserInfoWithRelationDetail
 from common.exception.errors import TokenError
 from common.log import log
 from common.security.jwt import jwt_authentication
+from common.security.principal import Principal
 from core.conf import settings
 from utils.serializers import MsgSpecJSONResponse
 
@@ -63,7 +63,7 @@ class JwtAuthMiddleware(AuthenticationBackend):
 
     async def authenticate(
         self, request: Request
-    ) -> tuple[AuthCredentials, GetUserInfoWithRelationDetail] | None:
+    ) -> tuple[AuthCredentials, Principal] | None:
         """
         Authenticate request
 
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+from fastapi import Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+
+from common.log import log
+from core.conf import settings
+from utils.request_id import QueryStats, get_query_stats
+
+
+class QueryStatsMiddleware(BaseHTTPMiddleware):
+    """Per-request query statistics middleware"""
+
+    async def dispatch(
+        self, request: Request, call_next: RequestResponseEndpoint
+    ) -> Response:
+        """
+        Report queries issued by a request, as response headers in dev and as a log line otherwise,
+        and warn about exceeded query budgets and repeated statements
+
+        :param request: FastAPI request object
+        :param call_next: Next middleware or route handler function
+        :return:
+        """
+        response = await call_next(request)
+        query_stats = get_query_stats()
+        if query_stats is None or not query_stats.count:
+            return response
+
+        route = request.scope.get("route")
+        path = getattr(route, "path_format", request.url.path)
+        repeated = query_stats.repeated(settings.DATABASE_QUERY_REPEAT_THRESHOLD)
+        duration = round(query_stats.duration * 1000, 3)
+        if settings.ENVIRONMENT.lower() == "dev":
+            response.headers["X-DB-Query-Count"] = str(query_stats.count)
+            response.headers["X-DB-Query-Time"] = f"{duration}ms"
+            if repeated:
+                response.headers["X-DB-Query-Repeated"] = ",".join(
+                    f"{fingerprint}:{count}" for fingerprint, count in repeated.items()
+                )
+        else:
+            log.info(
+                f"db_queries={query_stats.count} db_time_ms={duration} "
+                f"db_repeated={len(repeated)} | {request.method} {path}"
+            )
+
+        budget = query_stats.budget or settings.DATABASE_QUERY_BUDGET
+        if query_stats.count > budget:
+            log.warning(
+                f"Query budget exceeded: {request.method} {path} issued "
+                f"{query_stats.count} queries, budget is {budget}"
+            )
+        if repeated:
+            log.warning(
+                f"Possible N+1 queries: {request.method} {path} repeated "
+                + "; ".join(self.describe(query_stats, repeated))
+            )
+        return response
+
+    @staticmethod
+    def describe(query_stats: QueryStats, repeated: dict[str, int]) -> list[str]:
+        """
+        Describe repeated statements
+
+        :param query_stats: Query statistics
+        :param repeated: Execution count by statement fingerprint
+        :return:
+        """
+        return [
+            f"{count}x [{fingerprint}] {' '.join(query_stats.samples[fingerprint].split())[:200]}"
+            for fingerprint, count in repeated.items()
+        ]
@@ -2,8 +2,10 @@
 # -*- coding: utf-8 -*-
 from typing import Any, Sequence
 
+from sqlalchemy import Row
+
 from common.enums import BuildTreeType
-from utils.serializers import RowData, select_list_serialize
+from utils.serializers import RowData, serializer_registry
 
 
 def get_tree_nodes(row: Sequence[RowData]) -> list[dict[str, Any]]:
@@ -13,57 +15,102 @@ def get_tree_nodes(row: Sequence[RowData]) -> list[dict[str, Any]]:
     :param row: 原始数据行序列
     :return:
     """
-    tree_nodes = select_list_serialize(row)
+    tree_nodes = serializer_registry.serialize_list(row)
     tree_nodes.sort(key=lambda x: x["sort"])
     return tree_nodes
 
 
-def traversal_to_tree(nodes: list[dict[str, Any]]) -> list[dict[str, Any]]:
+def get_lazy_tree_nodes(row: Sequence[Row]) -> list[dict[str, Any]]:
     """
-    通过遍历算法构造树形结构
+    获取懒加载树形结构节点，节点之后的列作为节点标记，如 has_children
+
+    :param row: (节点, 标记...) 数据行序列
+    :return:
+    """
+    tree_nodes = []
+    for data in row:
+        node = serializer_registry.serialize(data[0])
+        node.update(zip(data._fields[1:], data[1:]))
+        tree_nodes.append(node)
+    return tree_nodes
+
+
+def _link_tree(
+    nodes: list[dict[str, Any]], parent_id: int | None, *, keep_orphans: bool
+) -> list[dict[str, Any]]:
+    """
+    线性时间构造树形结构
+
+    每个节点只按其父节点 ID 分组一次，再从根节点出发迭代挂载子节点，节点顺序与输入顺序一致。
+    已挂载的节点不会被重复挂载，因此环中的节点不会形成循环引用
 
     :param nodes: 树节点列表
+    :param parent_id: 根节点的父节点 ID
+    :param keep_orphans: 是否将父节点不存在的孤儿节点及环中的节点作为根节点保留
     :return:
     """
+    node_ids = {node["id"] for node in nodes}
+    children: dict[Any, list[dict[str, Any]]] = {}
     tree: list[dict[str, Any]] = []
-    node_dict = {node["id"]: node for node in nodes}
-
     for node in nodes:
-        parent_id = node["parent_id"]
-        if parent_id is None:
+        node_parent_id = node["parent_id"]
+        if node_parent_id == parent_id or (
+            keep_orphans and node_parent_id not in node_ids
+        ):
             tree.append(node)
         else:
-            parent_node = node_dict.get(parent_id)
-            if parent_node is not None:
-                if "children" not in parent_node:
-                    parent_node["children"] = []
-                if node not in parent_node["children"]:
-                    parent_node["children"].append(node)
-            else:
-                if node not in tree:
-                    tree.append(node)
-
+            children.setdefault(node_parent_id, []).append(node)
+
+    # 按对象标识记录已挂载节点，重复 ID 的节点互不影响
+    linked: set[int] = set()
+
+    def link(roots: list[dict[str, Any]]) -> None:
+        linked.update(map(id, roots))
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            child_nodes = children.pop(node["id"], None)
+            if not child_nodes:
+                continue
+            child_nodes = [child for child in child_nodes if id(child) not in linked]
+            if child_nodes:
+                linked.update(map(id, child_nodes))
+                node.setdefault("children", []).extend(child_nodes)
+                stack.extend(child_nodes)
+
+    link(tree)
+    if keep_orphans and len(linked) < len(nodes):
+        # 剩余节点均无法到达根节点，即处于环中或挂在环上，依次以最先出现的未挂载节点为根断开环
+        for node in nodes:
+            if id(node) not in linked:
+                tree.append(node)
+                link([node])
     return tree
 
 
+def traversal_to_tree(nodes: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """
+    通过遍历算法构造树形结构
+
+    父节点不存在的孤儿节点作为根节点保留，环在其最先出现的节点处断开并作为根节点保留
+
+    :param nodes: 树节点列表
+    :return:
+    """
+    return _link_tree(nodes, None, keep_orphans=True)
+
+
 def recursive_to_tree(
     nodes: list[dict[str, Any]], *, parent_id: int | None = None
 ) -> list[dict[str, Any]]:
     """
-    通过递归算法构造树形结构（性能影响较大）
+    构造指定父节点下的树形结构，不属于该父节点的节点将被忽略
 
     :param nodes: 树节点列表
     :param parent_id: 父节点 ID，默认为 None 表示根节点
     :return:
     """
-    tree: list[dict[str, Any]] = []
-    for node in nodes:
-        if node["parent_id"] == parent_id:
-            child_nodes = recursive_to_tree(nodes, parent_id=node["id"])
-            if child_nodes:
-                node["children"] = child_nodes
-            tree.append(node)
-    return tree
+    return _link_tree(nodes, parent_id, keep_orphans=False)
 
 
 def get_tree_data(
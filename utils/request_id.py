@@ -1,12 +1,70 @@
 """Utilities for managing request identifiers across the application."""
 
+import hashlib
+import re
+from collections import Counter
 from contextvars import ContextVar
+from dataclasses import dataclass, field
 from typing import Optional
 from uuid import uuid4
 
 _DEFAULT_REQUEST_ID = "-"
 _REQUEST_ID_CTX: ContextVar[str] = ContextVar("request_id", default=_DEFAULT_REQUEST_ID)
 
+# Numbered placeholders of asyncpg carry type casts, e.g. `$1::INTEGER`, which are dropped too
+_PLACEHOLDER_RE = re.compile(
+    r"\$\d+(?:::\w+(?: WITH(?:OUT)? TIME ZONE)?(?:\([\d, ]+\))?(?:\[\])*)?"
+    r"|%\(\w+\)s|\?"
+)
+_PLACEHOLDER_LIST_RE = re.compile(r"\(\?(?:, \?)+\)")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def fingerprint_statement(statement: str) -> str:
+    """Return a short fingerprint of a SQL statement, ignoring parameter placeholders.
+
+    Placeholder lists of any length, e.g. of expanded IN clauses, share one fingerprint.
+    """
+    statement = _PLACEHOLDER_RE.sub("?", statement)
+    statement = _PLACEHOLDER_LIST_RE.sub("(?)", statement)
+    statement = _WHITESPACE_RE.sub(" ", statement).strip()
+    return hashlib.blake2b(statement.encode(), digest_size=6).hexdigest()
+
+
+@dataclass
+class QueryStats:
+    """SQL statements executed while handling a request."""
+
+    count: int = 0
+    # Total execution time in seconds
+    duration: float = 0.0
+    # Execution count and first statement text, by statement fingerprint
+    statements: Counter[str] = field(default_factory=Counter)
+    samples: dict[str, str] = field(default_factory=dict)
+    # Query budget of the route, the default budget applies when unset
+    budget: Optional[int] = None
+
+    def record(self, statement: str, duration: float) -> None:
+        """Record an executed statement."""
+        fingerprint = fingerprint_statement(statement)
+        self.count += 1
+        self.duration += duration
+        self.statements[fingerprint] += 1
+        self.samples.setdefault(fingerprint, statement)
+
+    def repeated(self, threshold: int = 2) -> dict[str, int]:
+        """Return fingerprints executed at least `threshold` times, most repeated first."""
+        return {
+            fingerprint: count
+            for fingerprint, count in self.statements.most_common()
+            if count >= threshold
+        }
+
+
+_QUERY_STATS_CTX: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
 
 def generate_request_id() -> str:
     """Return a new UUID4 string for request tracing."""
@@ -16,10 +74,12 @@ def generate_request_id() -> str:
 def set_request_id(value: Optional[str]) -> str:
     """Store the request id in context, falling back to a generated value.
 
-    Returns the normalized id to simplify reuse by callers.
+    Query statistics of the request are reset along with it. Returns the normalized id to
+    simplify reuse by callers.
     """
     request_id = value or generate_request_id()
     _REQUEST_ID_CTX.set(request_id)
+    _QUERY_STATS_CTX.set(QueryStats())
     return request_id
 
 
@@ -28,6 +88,12 @@ def get_request_id() -> str:
     return _REQUEST_ID_CTX.get()
 
 
+def get_query_stats() -> Optional[QueryStats]:
+    """Fetch query statistics of the current request, None outside of a request."""
+    return _QUERY_STATS_CTX.get()
+
+
 def clear_request_id() -> None:
     """Reset the request id context to its default placeholder."""
     _REQUEST_ID_CTX.set(_DEFAULT_REQUEST_ID)
+    _QUERY_STATS_CTX.set(None)
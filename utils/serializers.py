@@ -1,5 +1,6 @@
 from decimal import Decimal
-from typing import Any, Sequence, TypeVar
+from operator import attrgetter, itemgetter
+from typing import Any, Callable, Sequence, TypeVar
 
 from fastapi.encoders import decimal_encoder
 from msgspec import json
@@ -12,6 +13,175 @@ RowData = Row | RowMapping | Any
 R = TypeVar("R", bound=RowData)
 
 
+def _python_type(column: Any) -> type | None:
+    """
+    Get the Python type of a column, None if the type does not define one
+
+    :param column: Column
+    :return:
+    """
+    try:
+        return column.type.python_type
+    except NotImplementedError:
+        return None
+
+
+# Converters of column values that JSON encoders do not handle, keyed by the column Python type
+_CONVERTERS: dict[type, Callable[[Any], Any]] = {Decimal: decimal_encoder}
+
+
+class ModelSerializer:
+    """
+    Serializer of the columns of one mapped class, compiled once
+
+    Loaded column values are read from the instance state with a single `operator.itemgetter`,
+    bypassing the attribute instrumentation, rows with unloaded or expired columns fall back to
+    an `operator.attrgetter`. Converters are resolved from the column types at compile time, so
+    serializing a row neither looks up the table nor checks the type of every value
+    """
+
+    __slots__ = ("keys", "loaded_getter", "getter", "converters", "relationships")
+
+    def __init__(self, model: type) -> None:
+        """
+        Compile serializer
+
+        :param model: Mapped class
+        :return:
+        """
+        mapper = class_mapper(model)
+        self.keys: tuple[str, ...] = tuple(prop.key for prop in mapper.column_attrs)
+        loaded_getter = itemgetter(*self.keys)
+        getter = attrgetter(*self.keys)
+        # Getters of a single key return the value itself
+        if len(self.keys) > 1:
+            self.loaded_getter: Callable[[dict], tuple] = loaded_getter
+            self.getter: Callable[[Any], tuple] = getter
+        else:
+            self.loaded_getter = lambda state: (loaded_getter(state),)
+            self.getter = lambda row: (getter(row),)
+        self.converters: tuple[tuple[str, Callable[[Any], Any]], ...] = tuple(
+            (prop.key, _CONVERTERS[python_type])
+            for prop in mapper.column_attrs
+            if (python_type := _python_type(prop.columns[0])) in _CONVERTERS
+        )
+        # Key, whether it is a collection, and keys of its back references
+        self.relationships: tuple[tuple[str, bool, frozenset[str]], ...] = tuple(
+            (
+                prop.key,
+                prop.uselist,
+                frozenset((prop.back_populates,) if prop.back_populates else ()),
+            )
+            for prop in mapper.relationships
+        )
+
+    def __call__(self, row: Any) -> dict[str, Any]:
+        """
+        Serialize the columns of a row
+
+        :param row: Mapped instance
+        :return:
+        """
+        try:
+            values = self.loaded_getter(row.__dict__)
+        except KeyError:
+            values = self.getter(row)
+        result = dict(zip(self.keys, values))
+        for key, converter in self.converters:
+            value = result[key]
+            if value is not None:
+                result[key] = converter(value)
+        return result
+
+
+class SerializerRegistry:
+    """Registry of the compiled serializers of mapped classes, compiled on first use"""
+
+    def __init__(self) -> None:
+        self._serializers: dict[type, ModelSerializer] = {}
+
+    def get(self, model: type) -> ModelSerializer:
+        """
+        Get serializer of a mapped class
+
+        :param model: Mapped class
+        :return:
+        """
+        serializer = self._serializers.get(model)
+        if serializer is None:
+            serializer = self._serializers[model] = ModelSerializer(model)
+        return serializer
+
+    def serialize(self, row: Any) -> dict[str, Any]:
+        """
+        Serialize the columns of a row, does not contain relational columns
+
+        :param row: Mapped instance
+        :return:
+        """
+        return self.get(type(row))(row)
+
+    def serialize_list(self, rows: Sequence[Any]) -> list[dict[str, Any]]:
+        """
+        Serialize the columns of rows of one mapped class
+
+        :param rows: Mapped instances
+        :return:
+        """
+        if not rows:
+            return []
+        serializer = self.get(type(rows[0]))
+        return [serializer(row) for row in rows]
+
+    def serialize_loaded(
+        self,
+        row: Any,
+        _path: frozenset[int] = frozenset(),
+        _skip: frozenset[str] = frozenset(),
+    ) -> dict[str, Any]:
+        """
+        Serialize the columns and the already loaded relationships of a row
+
+        Relationships that are not loaded are left out rather than loaded. Back references of the
+        relationship a related row was reached through are left out, as are instances already
+        serialized higher up the same path, so shared related rows do not recurse
+
+        :param row: Mapped instance
+        :return:
+        """
+        serializer = self.get(type(row))
+        result = serializer(row)
+        loaded = row.__dict__
+        path = _path | {id(row)}
+        for key, uselist, reverse in serializer.relationships:
+            if key in _skip or key not in loaded:
+                continue
+            value = loaded[key]
+            if uselist:
+                result[key] = [
+                    self.serialize_loaded(item, path, reverse)
+                    for item in value or ()
+                    if id(item) not in path
+                ]
+            elif value is None or id(value) in path:
+                result[key] = None
+            else:
+                result[key] = self.serialize_loaded(value, path, reverse)
+        return result
+
+    def serialize_loaded_list(self, rows: Sequence[Any]) -> list[dict[str, Any]]:
+        """
+        Serialize the columns and the already loaded relationships of rows
+
+        :param rows: Mapped instances
+        :return:
+        """
+        return [self.serialize_loaded(row) for row in rows]
+
+
+serializer_registry: SerializerRegistry = SerializerRegistry()
+
+
 def select_columns_serialize(row: R) -> dict:
     """
     Serialize SQLAlchemy select table columns, does not contain relational columns
@@ -19,13 +189,7 @@ def select_columns_serialize(row: R) -> dict:
     :param row:
     :return:
     """
-    result = {}
-    for column in row.__table__.columns.keys():
-        v = getattr(row, column)
-        if isinstance(v, Decimal):
-            v = decimal_encoder(v)
-        result[column] = v
-    return result
+    return serializer_registry.serialize(row)
 
 
 def select_list_serialize(row: Sequence[R]) -> list:
@@ -35,8 +199,7 @@ def select_list_serialize(row: Sequence[R]) -> list:
     :param row:
     :return:
     """
-    result = [select_columns_serialize(_) for _ in row]
-    return result
+    return [serializer_registry.serialize(_) for _ in row]
 
 
 def select_as_dict(row: R, use_alias: bool = False) -> dict:
@@ -52,9 +215,8 @@ def select_as_dict(row: R, use_alias: bool = False) -> dict:
     :return:
     """
     if not use_alias:
-        result = row.__dict__
-        if "_sa_instance_state" in result:
-            del result["_sa_instance_state"]
+        # The instance state must stay in place, the instance is unusable without it
+        result = {k: v for k, v in row.__dict__.items() if k != "_sa_instance_state"}
     else:
         result = {}
         mapper = class_mapper(row.__class__)